@@ -7,7 +7,7 @@ https://github.com/clementprevot/home-assistant-idiamant
 
 from __future__ import annotations
 
-from datetime import timedelta
+import asyncio
 from http import HTTPStatus
 import logging
 
@@ -28,24 +28,31 @@ from homeassistant.helpers import (
 )
 from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.typing import ConfigType
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from homeassistant.helpers.update_coordinator import UpdateFailed
 
-from . import api, config_flow
+# The config flow and the platforms are only imported by Home Assistant when needed, so that
+# importing the integration stays cheap.
+from . import api
 from .const import (
     AUTH,
-    DATA_HOMES,
-    DATA_MODULES,
-    DATA_ROOMS,
+    CONF_CONNECTION_LIMIT,
+    CONF_DEDICATED_SESSION,
+    CONF_HOMES,
+    DATA_HANDLER,
+    DATA_SCHEDULER,
+    DEFAULT_OPTIONS,
     DOMAIN,
+    GATEWAY_TYPES,
+    HOMESDATA_PATH,
     OAUTH2_AUTHORIZE_URL,
     OAUTH2_TOKEN_URL,
     PLATFORMS,
     SCOPES,
-    TYPE_SECURITY,
+    SESSION_OPTIONS,
 )
-
-SCAN_INTERVAL = timedelta(minutes=1)
+from .data_handler import IDiamantDataHandler, get_topology_cache
+from .entity import async_populate_devices
+from .scheduler import IDiamantScheduler
+from .services import async_setup_services
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
@@ -68,16 +75,17 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """
 
     hass.data[DOMAIN] = {
-        DATA_HOMES: {},
-        DATA_ROOMS: {},
-        DATA_MODULES: {},
+        DATA_SCHEDULER: IDiamantScheduler(hass),
     }
 
+    async_setup_services(hass)
+
     if DOMAIN not in config:
         return True
 
-    config_flow.IDiamantFlowHandler.async_register_implementation(
+    config_entry_oauth2_flow.async_register_implementation(
         hass,
+        DOMAIN,
         config_entry_oauth2_flow.LocalOAuth2Implementation(
             hass,
             DOMAIN,
@@ -102,14 +110,74 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         )
     )
 
-    # Set unique id if non was set.
-    if not entry.unique_id:
-        hass.config_entries.async_update_entry(entry, unique_id=DOMAIN)
-
     session = config_entry_oauth2_flow.OAuth2Session(hass, entry, implementation)
 
+    options = {**DEFAULT_OPTIONS, **entry.options}
+    if options[CONF_DEDICATED_SESSION]:
+        websession, connection_stats = await api.async_create_dedicated_session(
+            hass, options[CONF_CONNECTION_LIMIT]
+        )
+        auth = api.AsyncConfigEntryNetatmoAuth(websession, session, connection_stats)
+    else:
+        auth = api.AsyncConfigEntryNetatmoAuth(
+            aiohttp_client.async_get_clientsession(hass), session
+        )
+
+    # The requests made just before a restart still count in the hourly budget.
+    await auth.async_load_request_history(api.get_request_history(hass, entry))
+
+    hass.data[DOMAIN][entry.entry_id] = {AUTH: auth}
+    data_handler = IDiamantDataHandler(hass, entry)
+
+    # The topology is loaded (from the cache when possible) while the token is validated.
+    token_result, topology_result = await asyncio.gather(
+        async_validate_token(auth, session),
+        data_handler.async_setup(),
+        return_exceptions=True,
+    )
+
+    for result in (token_result, topology_result):
+        if isinstance(result, BaseException):
+            hass.data[DOMAIN].pop(entry.entry_id)
+            await data_handler.async_shutdown()
+            await auth.async_close()
+
+            if isinstance(result, api.ApiError):
+                raise ConfigEntryNotReady from result
+
+            raise result
+
+    if entry.unique_id == DOMAIN:
+        await async_migrate_unique_id(hass, entry, auth)
+
+    hass.data[DOMAIN][entry.entry_id][DATA_HANDLER] = data_handler
+
+    async_populate_devices(hass, entry, data_handler.store)
+
+    entry.async_on_unload(entry.add_update_listener(async_config_entry_updated))
+
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    # The first status poll is made by the scheduler, in the background.
+    data_handler.async_start()
+
+    return True
+
+
+async def async_validate_token(
+    auth: api.AsyncConfigEntryNetatmoAuth,
+    session: config_entry_oauth2_flow.OAuth2Session,
+) -> None:
+    """
+    Make sure the token of the config entry is valid and has the expected scopes.
+
+    Raises:
+        ConfigEntryAuthFailed: When the token has to be renewed.
+        ConfigEntryNotReady: When the token could not be validated.
+    """
+
     try:
-        await session.async_ensure_token_valid()
+        await auth.async_get_access_token()
 
     except aiohttp.ClientResponseError as ex:
         _LOGGER.debug("API error: %s (%s)", ex.code, ex.message)
@@ -123,28 +191,72 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
         raise ConfigEntryNotReady from ex
 
+    except aiohttp.ClientError as ex:
+        raise ConfigEntryNotReady from ex
+
     if sorted(session.token["scope"]) != sorted(SCOPES):
         _LOGGER.debug("Scopes are invalids: %s != %s", session.token["scope"], SCOPES)
 
         raise ConfigEntryAuthFailed("Token scopes not valid, trigger renewal")
 
-    hass.data[DOMAIN][entry.entry_id] = {
-        AUTH: api.AsyncConfigEntryNetatmoAuth(
-            aiohttp_client.async_get_clientsession(hass), session
+
+async def async_migrate_unique_id(
+    hass: HomeAssistant, entry: ConfigEntry, auth: api.AsyncConfigEntryNetatmoAuth
+) -> None:
+    """
+    Bind an entry created before entries were bound to their Netatmo account (with the domain as
+    unique id) to the account of its token.
+    Left for the next setup when the account cannot be fetched.
+    """
+
+    homes_data = await auth.async_request(
+        "GET", HOMESDATA_PATH, params={"gateway_types": ",".join(GATEWAY_TYPES)}
+    )
+
+    user_id = ((homes_data or {}).get("body") or {}).get("user", {}).get("id")
+    if not user_id:
+        _LOGGER.debug("Unable to fetch the Netatmo account of %s", entry.title)
+
+        return
+
+    if any(
+        other_entry.unique_id == user_id
+        for other_entry in hass.config_entries.async_entries(DOMAIN)
+    ):
+        _LOGGER.warning(
+            "The Netatmo account of %s is configured twice, remove one of its entries",
+            entry.title,
         )
-    }
 
-    # data_handler = NetatmoDataHandler(hass, entry)
-    # await data_handler.async_setup()
-    # hass.data[DOMAIN][entry.entry_id][DATA_HANDLER] = data_handler
+        return
 
-    hass.config_entries.async_setup_platforms(entry, PLATFORMS)
+    hass.config_entries.async_update_entry(entry, unique_id=user_id)
 
 
 async def async_config_entry_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """
     Handle signals of config entry being updated.
     """
+
+    if data_handler := hass.data[DOMAIN].get(entry.entry_id, {}).get(DATA_HANDLER):
+        # Entities come and go with the tracked homes, and the session is created with the
+        # config entry, which requires a reload.
+        options = {**DEFAULT_OPTIONS, **entry.options}
+        homes_changed = sorted(options[CONF_HOMES]) != sorted(
+            data_handler.options[CONF_HOMES]
+        )
+        session_changed = any(
+            options[option] != data_handler.options[option]
+            for option in SESSION_OPTIONS
+        )
+
+        if homes_changed or session_changed:
+            await hass.config_entries.async_reload(entry.entry_id)
+
+            return
+
+        data_handler.async_apply_options(entry.options)
+
     async_dispatcher_send(hass, f"signal-{DOMAIN}-public-update-{entry.entry_id}")
 
 
@@ -157,6 +269,18 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     if unload_ok and entry.entry_id in data:
-        data.pop(entry.entry_id)
+        entry_data = data.pop(entry.entry_id)
+
+        await entry_data[DATA_HANDLER].async_shutdown()
+        await entry_data[AUTH].async_close()
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """
+    Remove the cached topology and the request history of a removed config entry.
+    """
+
+    await get_topology_cache(hass, entry).async_remove()
+    await api.get_request_history(hass, entry).async_remove()
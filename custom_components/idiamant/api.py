@@ -2,26 +2,56 @@
 API for iDiamant bound to HASS OAuth.
 """
 
+from __future__ import annotations
+
 import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable
+from functools import partial
 import logging
 import socket
 from json import JSONDecodeError
+from time import monotonic, time
 from typing import cast
 
-from aiohttp import ClientError, ClientSession
+from aiohttp import ClientError, ClientSession, TCPConnector, TraceConfig
+from aiohttp.hdrs import USER_AGENT
 
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
 from homeassistant.helpers import config_entry_oauth2_flow
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE
+from homeassistant.helpers.storage import Store
+from homeassistant.util.ssl import client_context
 
 from .const import (
+    ACCEPT_ENCODING_HEADER,
+    ACCEPT_ENCODING_HEADER_COMPRESSED,
     AUTHORIZATION_HEADER,
     AUTHORIZATION_HEADER_BEARER,
     BASE_API_URL,
     DEFAULT_HEADERS,
+    DEFAULT_HOURLY_REQUEST_BUDGET,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DNS_CACHE_TTL,
+    DOMAIN,
+    HEDGE_BUDGET_RATIO,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
+    HEDGE_SAMPLES,
+    KEEPALIVE_TIMEOUT,
+    MIN_HEDGE_DELAY,
     TIMEOUT,
 )
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
+REQUEST_HISTORY_STORAGE_VERSION = 1
+# Delay (in seconds) before writing the request history, to group the writes.
+REQUEST_HISTORY_SAVE_DELAY = 30
+# Length (in seconds) of the rolling window over which the requests are counted.
+REQUEST_WINDOW = 3600
+
 
 class ApiError(Exception):
     """
@@ -29,6 +59,18 @@ class ApiError(Exception):
     """
 
 
+def get_request_history(hass: HomeAssistant, config_entry: ConfigEntry) -> Store:
+    """
+    Get the storage keeping the requests made for given config entry during the last hour.
+    """
+
+    return Store(
+        hass,
+        REQUEST_HISTORY_STORAGE_VERSION,
+        f"{DOMAIN}.{config_entry.entry_id}.requests",
+    )
+
+
 def get_url(path: str) -> str:
     """
     Get the full Netatmo Connect API URL for the given path.
@@ -43,6 +85,305 @@ def get_url(path: str) -> str:
     return BASE_API_URL + path
 
 
+class ConnectionStats:
+    """
+    Count how the requests made through a session got their connection, to make sure the
+    connections (and their TLS handshakes) are reused.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the statistics.
+        """
+
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def get_trace_config(self) -> TraceConfig:
+        """
+        Get the trace configuration feeding the statistics, to attach to a session.
+        """
+
+        async def on_request_start(session, context, params) -> None:
+            self.requests += 1
+
+        async def on_connection_create_end(session, context, params) -> None:
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params) -> None:
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, context, params) -> None:
+            self.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, context, params) -> None:
+            self.dns_cache_misses += 1
+
+        trace_config = TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+
+        return trace_config
+
+    @property
+    def reuse_ratio(self) -> float | None:
+        """
+        Return the share of the connections that were reused rather than created.
+        """
+
+        connections = self.connections_created + self.connections_reused
+
+        if not connections:
+            return None
+
+        return self.connections_reused / connections
+
+    def as_dict(self) -> dict:
+        """
+        Return the statistics.
+        """
+
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": self.reuse_ratio,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+
+
+async def async_create_dedicated_session(
+    hass: HomeAssistant,
+    connection_limit: int,
+) -> tuple[ClientSession, ConnectionStats]:
+    """
+    Create a session dedicated to the Netatmo Connect API, rather than sharing the connections of
+    the Home Assistant session with every other integration.
+    Its connections are kept alive between polls, the address of the API is cached and the
+    responses are compressed.
+    The SSL context is built in the executor, as loading the certificate authorities reads files.
+
+    Args:
+        connection_limit (int): The maximum number of connections opened at the same time.
+
+    Returns:
+        tuple: The session and its connection statistics.
+    """
+
+    ssl_context = await hass.async_add_executor_job(client_context)
+
+    stats = ConnectionStats()
+    connector = TCPConnector(
+        limit=connection_limit,
+        limit_per_host=connection_limit,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        use_dns_cache=True,
+        enable_cleanup_closed=True,
+        ssl=ssl_context,
+    )
+
+    session = ClientSession(
+        connector=connector,
+        headers={
+            ACCEPT_ENCODING_HEADER: ACCEPT_ENCODING_HEADER_COMPRESSED,
+            USER_AGENT: SERVER_SOFTWARE,
+        },
+        trace_configs=[stats.get_trace_config()],
+    )
+
+    return session, stats
+
+
+class RequestLimiter:
+    """
+    Limit the number of concurrent requests and keep track of the requests made to the Netatmo
+    Connect API over a rolling hour.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        hourly_budget: int = DEFAULT_HOURLY_REQUEST_BUDGET,
+    ) -> None:
+        """
+        Initialize the limiter.
+        """
+
+        self.max_concurrent = max_concurrent
+        self.hourly_budget = hourly_budget
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._timestamps: deque[float] = deque()
+
+    def configure(self, max_concurrent: int, hourly_budget: int) -> None:
+        """
+        Update the limits.
+        Requests already waiting for a slot keep waiting on the previous limit.
+        """
+
+        if max_concurrent != self.max_concurrent:
+            self.max_concurrent = max_concurrent
+            self._semaphore = asyncio.Semaphore(max_concurrent)
+
+        self.hourly_budget = hourly_budget
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """
+        Return the semaphore bounding the number of concurrent requests.
+        """
+
+        return self._semaphore
+
+    @property
+    def used(self) -> int:
+        """
+        Return the number of requests made during the last hour.
+        """
+
+        self._expire()
+
+        return len(self._timestamps)
+
+    @property
+    def remaining(self) -> int:
+        """
+        Return the number of requests that can still be made during the current rolling hour.
+        """
+
+        return max(self.hourly_budget - self.used, 0)
+
+    @property
+    def next_available(self) -> float:
+        """
+        Return the time at which a request can be made without exceeding the hourly budget.
+        """
+
+        if self.remaining:
+            return time()
+
+        # The oldest requests have to leave the rolling hour to free the budget.
+        return self._timestamps[-self.hourly_budget] + REQUEST_WINDOW
+
+    def record(self) -> None:
+        """
+        Record a request made now.
+        """
+
+        self._timestamps.append(time())
+
+    def export(self) -> list[int]:
+        """
+        Export the requests made during the last hour, as compact integer timestamps.
+        """
+
+        self._expire()
+
+        return [int(timestamp) for timestamp in self._timestamps]
+
+    def restore(self, timestamps: list[float]) -> None:
+        """
+        Restore the requests made during the last hour, before the ones recorded since.
+        """
+
+        self._timestamps = deque(sorted([*timestamps, *self._timestamps]))
+        self._expire()
+
+    def _expire(self) -> None:
+        """
+        Forget the requests that left the rolling hour.
+        """
+
+        horizon = time() - REQUEST_WINDOW
+
+        while self._timestamps and self._timestamps[0] <= horizon:
+            self._timestamps.popleft()
+
+
+class RequestHedger:
+    """
+    Keep track of the latency of the read requests made to each endpoint, to decide when a slow
+    request is worth a second, hedged, one.
+    Hedged requests are limited to a share of the requests made over the rolling hour, so that
+    they do not eat into the quota.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the hedger, disabled.
+        """
+
+        self.enabled = False
+        self._latencies: dict[str, deque[float]] = {}
+        self._hedges: deque[float] = deque()
+
+    def record_latency(self, path: str, latency: float) -> None:
+        """
+        Record the time a successful read request to given endpoint took, or had taken when
+        cancelled after its hedge answered first.
+        """
+
+        if path not in self._latencies:
+            self._latencies[path] = deque(maxlen=HEDGE_SAMPLES)
+
+        self._latencies[path].append(latency)
+
+    def get_delay(self, path: str, timeout: float) -> float | None:
+        """
+        Return the time after which a read request to given endpoint is hedged: the
+        `HEDGE_PERCENTILE` percentile of its latency.
+
+        Returns:
+            float: The delay, in seconds, or None while too few requests were made to know it.
+        """
+
+        latencies = self._latencies.get(path)
+        if latencies is None or len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+
+        ordered = sorted(latencies)
+        percentile = ordered[(len(ordered) - 1) * HEDGE_PERCENTILE // 100]
+
+        return min(max(percentile, MIN_HEDGE_DELAY), timeout)
+
+    def can_hedge(self, limiter: RequestLimiter) -> bool:
+        """
+        Return whether a hedged request fits in the budget.
+        """
+
+        horizon = time() - REQUEST_WINDOW
+
+        while self._hedges and self._hedges[0] <= horizon:
+            self._hedges.popleft()
+
+        return (
+            limiter.remaining > 1
+            and len(self._hedges) < limiter.used * HEDGE_BUDGET_RATIO
+        )
+
+    def record_hedge(self) -> None:
+        """
+        Record a hedged request made now.
+        """
+
+        self._hedges.append(time())
+
+    @property
+    def hedges(self) -> int:
+        """
+        Return the number of hedged requests made during the last hour.
+        """
+
+        return len(self._hedges)
+
+
 class AsyncConfigEntryNetatmoAuth:
     """
     Provide Netatmo Connect API authentication tied to an OAuth2 based config entry.
@@ -52,21 +393,77 @@ class AsyncConfigEntryNetatmoAuth:
         self,
         websession: ClientSession,
         oauth_session: config_entry_oauth2_flow.OAuth2Session,
+        connection_stats: ConnectionStats | None = None,
     ) -> None:
         """
         Initialize the authentication.
+
+        Args:
+            connection_stats (ConnectionStats, optional): The connection statistics of the session
+                                                         when it is dedicated to the
+                                                         authentication, which then owns it.
+                                                         Defaults to None.
         """
 
         self.websession = websession
+        self.connection_stats = connection_stats
         self._oauth_session = oauth_session
+        self.timeout = TIMEOUT
+        self.limiter = RequestLimiter()
+        self.hedger = RequestHedger()
+        self._token_lock = asyncio.Lock()
+        self._request_history: Store | None = None
+
+    def configure(
+        self,
+        max_concurrent: int,
+        timeout: int,
+        hourly_budget: int,
+        hedge_requests: bool = False,
+    ) -> None:
+        """
+        Update the request limits, applied to the next requests.
+        """
+
+        self.timeout = timeout
+        self.limiter.configure(max_concurrent, hourly_budget)
+        self.hedger.enabled = hedge_requests
+
+    async def async_load_request_history(self, request_history: Store) -> None:
+        """
+        Restore the requests made during the last hour, so that the hourly budget survives a
+        restart, then keep the history up to date.
+        """
+
+        if timestamps := await request_history.async_load():
+            self.limiter.restore(timestamps)
+
+            _LOGGER.debug(
+                "%s requests made during the last hour restored", self.limiter.used
+            )
+
+        self._request_history = request_history
+
+    async def async_close(self) -> None:
+        """
+        Write the request history and close the session, when dedicated to the authentication.
+        """
+
+        if self._request_history is not None:
+            await self._request_history.async_save(self.limiter.export())
+
+        if self.connection_stats is not None and not self.websession.closed:
+            await self.websession.close()
 
     async def async_get_access_token(self) -> str:
         """
         Return a valid access token for Netatmo Connect API.
+        Concurrent callers wait for a single token refresh.
         """
 
-        if not self._oauth_session.valid_token:
-            await self._oauth_session.async_ensure_token_valid()
+        async with self._token_lock:
+            if not self._oauth_session.valid_token:
+                await self._oauth_session.async_ensure_token_valid()
 
         return cast(str, self._oauth_session.token["access_token"])
 
@@ -76,11 +473,12 @@ class AsyncConfigEntryNetatmoAuth:
         path: str,
         body: dict = None,
         headers: dict = None,
-        timeout: int = TIMEOUT,
+        timeout: int = None,
+        params: dict = None,
     ) -> dict:
         """
         Construct an API call to Netatmo Connect API.
-        If any error occurs, it will be logged.
+        If any error occurs, it will be logged. Slow read requests are hedged, when enabled.
 
         Args:
             method (str): The method to use to call the endpoint: 'GET', 'POST', 'PATCH', 'PUT' or
@@ -91,6 +489,10 @@ class AsyncConfigEntryNetatmoAuth:
             headers (dict, optional): The headers of the call to the endpoint. Those will be added
                                       (or will overwrite) default header.
                                       Defaults to {}.
+            timeout (int, optional): The timeout of the call, in seconds.
+                                     Defaults to the configured request timeout.
+            params (dict, optional): The query string parameters of the call.
+                                     Defaults to {}.
 
         Returns:
             dict: The data returned by the endpoint (if any).
@@ -104,53 +506,28 @@ class AsyncConfigEntryNetatmoAuth:
         method_to_use = method.upper()
         headers_to_use = {
             **DEFAULT_HEADERS,
-            **headers,
+            **(headers or {}),
             AUTHORIZATION_HEADER: f"{AUTHORIZATION_HEADER_BEARER} {access_token}",
         }
 
-        url = get_url(path)
-
-        try:
-            response = None
+        timeout_to_use = timeout or self.timeout
 
-            if method_to_use == "GET":
-                response = await self.websession.get(
-                    url, headers=headers_to_use, timeout=timeout
-                )
+        send = partial(
+            self._async_send,
+            method_to_use,
+            path,
+            headers_to_use,
+            body,
+            params,
+            timeout_to_use,
+        )
 
-            elif method_to_use == "PUT":
-                response = await self.websession.put(
-                    url, headers=headers_to_use, json=body, timeout=timeout
-                )
-
-            elif method_to_use == "PATCH":
-                response = await self.websession.patch(
-                    url, headers=headers_to_use, json=body, timeout=timeout
-                )
-
-            elif method_to_use == "POST":
-                response = await self.websession.post(
-                    url, headers=headers_to_use, json=body, timeout=timeout
-                )
+        try:
+            # Only read requests can safely be sent twice.
+            if method_to_use == "GET" and self.hedger.enabled:
+                return await self._async_hedge(path, send, timeout_to_use)
 
-            if response is not None:
-                if not response.ok:
-                    _LOGGER.error("Error while calling %s: %s", path, response.status)
-                    try:
-                        decoded_response = await response.json()
-                        raise ApiError(
-                            f"{response.status} - "
-                            f"{decoded_response['error']['message']} "
-                            f"({decoded_response['error']['code']}) "
-                            f"when accessing '{url}'",
-                        )
-
-                    except JSONDecodeError as exc:
-                        raise ApiError(
-                            f"{response.status} - " f"when accessing '{url}'",
-                        ) from exc
-
-                return await response.json()
+            return await send()
 
         except asyncio.TimeoutError as exception:
             _LOGGER.error(
@@ -177,3 +554,136 @@ class AsyncConfigEntryNetatmoAuth:
             _LOGGER.error("Something really wrong happened! %s", exception)
 
         return None
+
+    async def _async_send(
+        self,
+        method: str,
+        path: str,
+        headers: dict,
+        body: dict | None,
+        params: dict | None,
+        timeout: int,
+    ) -> dict | None:
+        """
+        Send a request to Netatmo Connect API and decode its response.
+
+        Raises:
+            ApiError: When the endpoint answered with an error.
+        """
+
+        url = get_url(path)
+        response = None
+
+        async with self.limiter.semaphore:
+            self.limiter.record()
+
+            if self._request_history is not None:
+                self._request_history.async_delay_save(
+                    self.limiter.export, REQUEST_HISTORY_SAVE_DELAY
+                )
+
+            started = monotonic()
+
+            if method == "GET":
+                response = await self.websession.get(
+                    url,
+                    headers=headers,
+                    params=params,
+                    timeout=timeout,
+                )
+
+            elif method == "PUT":
+                response = await self.websession.put(
+                    url,
+                    headers=headers,
+                    params=params,
+                    json=body,
+                    timeout=timeout,
+                )
+
+            elif method == "PATCH":
+                response = await self.websession.patch(
+                    url,
+                    headers=headers,
+                    params=params,
+                    json=body,
+                    timeout=timeout,
+                )
+
+            elif method == "POST":
+                response = await self.websession.post(
+                    url,
+                    headers=headers,
+                    params=params,
+                    json=body,
+                    timeout=timeout,
+                )
+
+        if response is None:
+            return None
+
+        if not response.ok:
+            _LOGGER.error("Error while calling %s: %s", path, response.status)
+            try:
+                decoded_response = await response.json()
+                raise ApiError(
+                    f"{response.status} - "
+                    f"{decoded_response['error']['message']} "
+                    f"({decoded_response['error']['code']}) "
+                    f"when accessing '{url}'",
+                )
+
+            except JSONDecodeError as exc:
+                raise ApiError(
+                    f"{response.status} - " f"when accessing '{url}'",
+                ) from exc
+
+        decoded_response = await response.json()
+
+        if method == "GET":
+            self.hedger.record_latency(path, monotonic() - started)
+
+        return decoded_response
+
+    async def _async_hedge(
+        self, path: str, send: Callable[[], Awaitable[dict | None]], timeout: int
+    ) -> dict | None:
+        """
+        Send a read request and, when it runs past the usual latency of the endpoint, a second
+        identical one, then use the first answer.
+        The losing request is cancelled.
+        """
+
+        started = monotonic()
+        tasks = [asyncio.ensure_future(send())]
+
+        try:
+            delay = self.hedger.get_delay(path, timeout)
+
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+
+                if not done and self.hedger.can_hedge(self.limiter):
+                    _LOGGER.debug("Hedging a request to %s after %.2fs", path, delay)
+
+                    self.hedger.record_hedge()
+                    tasks.append(asyncio.ensure_future(send()))
+
+            error: BaseException | None = None
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+
+                except Exception as exception:  # pylint: disable=broad-except
+                    error = exception
+
+            raise error
+
+        finally:
+            # A slow request beaten by its hedge still tells how slow the endpoint is, or the
+            # latencies would only ever keep the fast requests.
+            if len(tasks) > 1 and not tasks[0].done():
+                self.hedger.record_latency(path, monotonic() - started)
+
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,79 @@
+"""
+Binary sensor platform for iDiamant.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+    BinarySensorEntityDescription,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DATA_HANDLER, DOMAIN
+from .data_handler import IDiamantDataHandler
+from .entity import (
+    IdiamantRecordEntity,
+    IdiamantRequiredKeysMixin,
+    async_subscribe_entities,
+)
+
+
+@dataclass
+class IdiamantBinarySensorEntityDescription(
+    BinarySensorEntityDescription, IdiamantRequiredKeysMixin
+):
+    """
+    Describes an iDiamant binary sensor.
+    """
+
+
+REACHABLE_SENSOR = IdiamantBinarySensorEntityDescription(
+    key="reachable",
+    name="Reachable",
+    device_class=BinarySensorDeviceClass.CONNECTIVITY,
+    entity_category=EntityCategory.DIAGNOSTIC,
+    value_fn=lambda record: record.reachable,
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """
+    Set up the reachability of every bridge and module of the topology, in a single pass.
+    """
+
+    data_handler: IDiamantDataHandler = hass.data[DOMAIN][entry.entry_id][DATA_HANDLER]
+    store = data_handler.store
+
+    entities = [
+        IdiamantBinarySensor(data_handler, record, REACHABLE_SENSOR)
+        for record in (*store.bridges.values(), *store.modules.values())
+    ]
+
+    async_add_entities(entities)
+
+    await async_subscribe_entities(hass, entry, data_handler, entities)
+
+
+class IdiamantBinarySensor(IdiamantRecordEntity, BinarySensorEntity):
+    """
+    A health binary sensor of an iDiamant bridge or module.
+    """
+
+    entity_description: IdiamantBinarySensorEntityDescription
+
+    @property
+    def is_on(self) -> bool | None:
+        """
+        Return whether the binary sensor is on.
+        """
+
+        return self.value
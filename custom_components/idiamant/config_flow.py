@@ -4,19 +4,66 @@ Config flow for iDiamant.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 
+from aiohttp import ClientError
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
-from homeassistant.helpers import config_entry_oauth2_flow
+from homeassistant.helpers import (
+    aiohttp_client,
+    config_entry_oauth2_flow,
+    config_validation as cv,
+    selector,
+)
 
+from .api import get_url
 from .const import (
+    AUTH,
+    AUTHORIZATION_HEADER,
+    AUTHORIZATION_HEADER_BEARER,
+    CONF_ACTIVE_INTERVAL,
+    CONF_AWAY_INTERVAL,
+    CONF_CONNECTION_LIMIT,
+    CONF_DEDICATED_SESSION,
+    CONF_GATEWAY_INTERVAL,
+    CONF_HEDGE_REQUESTS,
+    CONF_HOMES,
+    CONF_HOURLY_REQUEST_BUDGET,
+    CONF_IDLE_INTERVAL,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_NIGHT_END,
+    CONF_NIGHT_INTERVAL,
+    CONF_NIGHT_START,
+    CONF_PRESENCE_ENTITY,
+    CONF_REQUEST_TIMEOUT,
+    CONF_SHUTTER_INTERVAL,
+    DEFAULT_HEADERS,
+    DEFAULT_OPTIONS,
     DOMAIN,
+    GATEWAY_TYPES,
+    HOMESDATA_PATH,
+    NAME,
     SCOPES,
+    TIMEOUT,
 )
 
+# Domains of the entities telling whether somebody is home.
+PRESENCE_DOMAINS = [
+    "binary_sensor",
+    "device_tracker",
+    "group",
+    "input_boolean",
+    "person",
+    "zone",
+]
+
+# Options of the polling profiles that can be cleared, to disable a profile.
+PROFILE_OPTIONAL_OPTIONS = [CONF_NIGHT_START, CONF_NIGHT_END, CONF_PRESENCE_ENTITY]
+
 
 class IDiamantFlowHandler(
     config_entry_oauth2_flow.AbstractOAuth2FlowHandler, domain=DOMAIN
@@ -27,6 +74,19 @@ class IDiamantFlowHandler(
 
     DOMAIN = DOMAIN
 
+    _reauth_entry: config_entries.ConfigEntry | None = None
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        """
+        Get the options flow for this handler.
+        """
+
+        return IDiamantOptionsFlowHandler(config_entry)
+
     @property
     def logger(self) -> logging.Logger:
         """
@@ -43,26 +103,15 @@ class IDiamantFlowHandler(
 
         return {"scope": " ".join(SCOPES)}
 
-    async def async_step_user(self, user_input: dict = None) -> FlowResult:
-        """
-        Handle a flow start.
-        """
-
-        await self.async_set_unique_id(DOMAIN)
-
-        if (
-            self.source != config_entries.SOURCE_REAUTH
-            and self._async_current_entries()
-        ):
-            return self.async_abort(reason="single_instance_allowed")
-
-        return await super().async_step_user(user_input)
-
-    async def async_step_reauth(self) -> FlowResult:
+    async def async_step_reauth(self, entry_data: dict = None) -> FlowResult:
         """
         Perform reauth upon an API authentication error.
         """
 
+        self._reauth_entry = self.hass.config_entries.async_get_entry(
+            self.context["entry_id"]
+        )
+
         return await self.async_step_reauth_confirm()
 
     async def async_step_reauth_confirm(self, user_input: dict = None) -> FlowResult:
@@ -80,14 +129,221 @@ class IDiamantFlowHandler(
 
     async def async_oauth_create_entry(self, data: dict) -> FlowResult:
         """
-        Create an oauth config entry or update existing entry for reauth.
+        Create an oauth config entry, one per Netatmo account, or update existing entry for
+        reauth.
         """
 
-        existing_entry = await self.async_set_unique_id(DOMAIN)
-        if existing_entry:
-            self.hass.config_entries.async_update_entry(existing_entry, data=data)
-            await self.hass.config_entries.async_reload(existing_entry.entry_id)
+        user = await self._async_get_user(data["token"]["access_token"])
+        if user is None:
+            return self.async_abort(reason="cannot_connect")
+
+        if self._reauth_entry:
+            # Entries created before they were bound to an account have the domain as unique id.
+            if self._reauth_entry.unique_id not in (DOMAIN, user["id"]):
+                return self.async_abort(reason="wrong_account")
+
+            self.hass.config_entries.async_update_entry(
+                self._reauth_entry, data=data, unique_id=user["id"]
+            )
+            await self.hass.config_entries.async_reload(self._reauth_entry.entry_id)
 
             return self.async_abort(reason="reauth_successful")
 
-        return await super().async_oauth_create_entry(data)
+        await self.async_set_unique_id(user["id"])
+        self._abort_if_unique_id_configured()
+
+        return self.async_create_entry(title=user.get("email", NAME), data=data)
+
+    async def _async_get_user(self, access_token: str) -> dict | None:
+        """
+        Get the Netatmo account the access token belongs to.
+        """
+
+        try:
+            response = await aiohttp_client.async_get_clientsession(self.hass).get(
+                get_url(HOMESDATA_PATH),
+                headers={
+                    **DEFAULT_HEADERS,
+                    AUTHORIZATION_HEADER: f"{AUTHORIZATION_HEADER_BEARER} {access_token}",
+                },
+                params={"gateway_types": ",".join(GATEWAY_TYPES)},
+                timeout=TIMEOUT,
+            )
+            response.raise_for_status()
+
+            return (await response.json())["body"]["user"]
+
+        except (asyncio.TimeoutError, ClientError, KeyError) as err:
+            self.logger.error("Unable to fetch the Netatmo account: %s", err)
+
+            return None
+
+
+class IDiamantOptionsFlowHandler(config_entries.OptionsFlow):
+    """
+    Options flow to tune the polling and the requests made to Netatmo Connect API.
+    """
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """
+        Initialize the options flow.
+        """
+
+        self.config_entry = config_entry
+        self.options = {**DEFAULT_OPTIONS, **config_entry.options}
+
+    async def async_step_init(self, user_input: dict = None) -> FlowResult:
+        """
+        Manage the polling and requests options.
+        """
+
+        if user_input is not None:
+            self.options.update(user_input)
+
+            return await self.async_step_profiles()
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_SHUTTER_INTERVAL,
+                        default=self.options[CONF_SHUTTER_INTERVAL],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=10)),
+                    vol.Required(
+                        CONF_GATEWAY_INTERVAL,
+                        default=self.options[CONF_GATEWAY_INTERVAL],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=60)),
+                    vol.Required(
+                        CONF_IDLE_INTERVAL,
+                        default=self.options[CONF_IDLE_INTERVAL],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=10)),
+                    vol.Required(
+                        CONF_ACTIVE_INTERVAL,
+                        default=self.options[CONF_ACTIVE_INTERVAL],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=2)),
+                    vol.Required(
+                        CONF_MAX_CONCURRENT_REQUESTS,
+                        default=self.options[CONF_MAX_CONCURRENT_REQUESTS],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
+                    vol.Required(
+                        CONF_REQUEST_TIMEOUT,
+                        default=self.options[CONF_REQUEST_TIMEOUT],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=60)),
+                    vol.Required(
+                        CONF_HOURLY_REQUEST_BUDGET,
+                        default=self.options[CONF_HOURLY_REQUEST_BUDGET],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=10)),
+                    vol.Required(
+                        CONF_HEDGE_REQUESTS,
+                        default=self.options[CONF_HEDGE_REQUESTS],
+                    ): bool,
+                    vol.Required(
+                        CONF_DEDICATED_SESSION,
+                        default=self.options[CONF_DEDICATED_SESSION],
+                    ): bool,
+                    vol.Required(
+                        CONF_CONNECTION_LIMIT,
+                        default=self.options[CONF_CONNECTION_LIMIT],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=20)),
+                }
+            ),
+        )
+
+    async def async_step_profiles(self, user_input: dict = None) -> FlowResult:
+        """
+        Set when polling slows down: during the night, and while nobody is home.
+        """
+
+        if user_input is not None:
+            self.options.update(
+                {
+                    option: user_input.get(option, "")
+                    for option in PROFILE_OPTIONAL_OPTIONS
+                }
+            )
+            self.options.update(user_input)
+
+            return await self.async_step_homes()
+
+        return self.async_show_form(
+            step_id="profiles",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_NIGHT_START,
+                        description={"suggested_value": self.options[CONF_NIGHT_START]},
+                    ): selector.selector({"time": {}}),
+                    vol.Optional(
+                        CONF_NIGHT_END,
+                        description={"suggested_value": self.options[CONF_NIGHT_END]},
+                    ): selector.selector({"time": {}}),
+                    vol.Required(
+                        CONF_NIGHT_INTERVAL,
+                        default=self.options[CONF_NIGHT_INTERVAL],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=60)),
+                    vol.Optional(
+                        CONF_PRESENCE_ENTITY,
+                        description={
+                            "suggested_value": self.options[CONF_PRESENCE_ENTITY]
+                        },
+                    ): selector.selector({"entity": {"domain": PRESENCE_DOMAINS}}),
+                    vol.Required(
+                        CONF_AWAY_INTERVAL,
+                        default=self.options[CONF_AWAY_INTERVAL],
+                    ): vol.All(vol.Coerce(int), vol.Range(min=60)),
+                }
+            ),
+        )
+
+    async def async_step_homes(self, user_input: dict = None) -> FlowResult:
+        """
+        Choose the homes to track among the homes of the account.
+        """
+
+        if user_input is not None:
+            self.options.update(user_input)
+
+            return self.async_create_entry(title="", data=self.options)
+
+        homes = await self._async_get_homes()
+
+        # Keep the current selection when the homes cannot be listed.
+        if not homes:
+            return self.async_create_entry(title="", data=self.options)
+
+        return self.async_show_form(
+            step_id="homes",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_HOMES,
+                        default=[
+                            home_id
+                            for home_id in self.options[CONF_HOMES]
+                            if home_id in homes
+                        ],
+                    ): cv.multi_select(homes),
+                }
+            ),
+        )
+
+    async def _async_get_homes(self) -> dict[str, str]:
+        """
+        Get the name of every home of the account, by id.
+        """
+
+        entry_data = self.hass.data.get(DOMAIN, {}).get(self.config_entry.entry_id)
+        if not entry_data:
+            return {}
+
+        homes_data = await entry_data[AUTH].async_request(
+            "GET", HOMESDATA_PATH, params={"gateway_types": ",".join(GATEWAY_TYPES)}
+        )
+        if homes_data is None:
+            return {}
+
+        return {
+            home["id"]: home.get("name", home["id"])
+            for home in homes_data["body"]["homes"]
+        }
@@ -10,17 +10,104 @@ MANUFACTURER = "Netatmo"
 DEFAULT_ATTRIBUTION = f"Data provided by {MANUFACTURER}"
 
 PLATFORMS = [
+    Platform.BINARY_SENSOR,
     Platform.COVER,
     Platform.SENSOR,
 ]
 
 BASE_API_URL = "https://api.netatmo.com"
 API_PATH = "/api"
+HOMESDATA_PATH = API_PATH + "/homesdata"
+HOMESTATUS_PATH = API_PATH + "/homestatus"
+SETSTATE_PATH = API_PATH + "/setstate"
 
 TIMEOUT = 10
 
+CONF_SHUTTER_INTERVAL = "shutter_interval"
+CONF_GATEWAY_INTERVAL = "gateway_interval"
+CONF_IDLE_INTERVAL = "idle_interval"
+CONF_ACTIVE_INTERVAL = "active_interval"
+CONF_MAX_CONCURRENT_REQUESTS = "max_concurrent_requests"
+CONF_REQUEST_TIMEOUT = "request_timeout"
+CONF_HOURLY_REQUEST_BUDGET = "hourly_request_budget"
+CONF_HOMES = "homes"
+CONF_DEDICATED_SESSION = "dedicated_session"
+CONF_CONNECTION_LIMIT = "connection_limit"
+CONF_HEDGE_REQUESTS = "hedge_requests"
+CONF_NIGHT_START = "night_start"
+CONF_NIGHT_END = "night_end"
+CONF_NIGHT_INTERVAL = "night_interval"
+CONF_PRESENCE_ENTITY = "presence_entity"
+CONF_AWAY_INTERVAL = "away_interval"
+
+DEFAULT_SHUTTER_INTERVAL = 60
+DEFAULT_GATEWAY_INTERVAL = 600
+DEFAULT_IDLE_INTERVAL = 300
+DEFAULT_ACTIVE_INTERVAL = 5
+DEFAULT_NIGHT_INTERVAL = 1800
+DEFAULT_AWAY_INTERVAL = 1800
+DEFAULT_MAX_CONCURRENT_REQUESTS = 2
+# Netatmo Connect API allows 500 requests per hour and per user.
+DEFAULT_HOURLY_REQUEST_BUDGET = 500
+DEFAULT_CONNECTION_LIMIT = 4
+
+DEFAULT_OPTIONS = {
+    CONF_SHUTTER_INTERVAL: DEFAULT_SHUTTER_INTERVAL,
+    CONF_GATEWAY_INTERVAL: DEFAULT_GATEWAY_INTERVAL,
+    CONF_IDLE_INTERVAL: DEFAULT_IDLE_INTERVAL,
+    CONF_ACTIVE_INTERVAL: DEFAULT_ACTIVE_INTERVAL,
+    CONF_MAX_CONCURRENT_REQUESTS: DEFAULT_MAX_CONCURRENT_REQUESTS,
+    CONF_REQUEST_TIMEOUT: TIMEOUT,
+    CONF_HOURLY_REQUEST_BUDGET: DEFAULT_HOURLY_REQUEST_BUDGET,
+    CONF_DEDICATED_SESSION: False,
+    CONF_CONNECTION_LIMIT: DEFAULT_CONNECTION_LIMIT,
+    CONF_HEDGE_REQUESTS: False,
+    # No night start or end, or no presence entity, disables the matching polling profile.
+    CONF_NIGHT_START: "",
+    CONF_NIGHT_END: "",
+    CONF_NIGHT_INTERVAL: DEFAULT_NIGHT_INTERVAL,
+    CONF_PRESENCE_ENTITY: "",
+    CONF_AWAY_INTERVAL: DEFAULT_AWAY_INTERVAL,
+    # No home selected means every home of the account is tracked.
+    CONF_HOMES: [],
+}
+
+# Options applied when the session is created, with the config entry.
+SESSION_OPTIONS = [
+    CONF_DEDICATED_SESSION,
+    CONF_CONNECTION_LIMIT,
+]
+
+# Time (in seconds) an idle connection of the dedicated session is kept open, longer than the
+# default shutters polling interval so that polls reuse it.
+KEEPALIVE_TIMEOUT = 90
+# Time (in seconds) the address of the Netatmo Connect API is cached by the dedicated session.
+DNS_CACHE_TTL = 3600
+
+# A read request is hedged once it runs past this percentile of the latency of its endpoint,
+# computed over the last `HEDGE_SAMPLES` requests, and no sooner than `MIN_HEDGE_DELAY` seconds.
+HEDGE_PERCENTILE = 95
+HEDGE_SAMPLES = 100
+HEDGE_MIN_SAMPLES = 20
+MIN_HEDGE_DELAY = 0.5
+# Share of the requests of the rolling hour that can be hedged.
+HEDGE_BUDGET_RATIO = 0.05
+
+# Time (in seconds) a home has to stay unchanged before being polled at the idle interval.
+QUIET_PERIOD = 900
+# Time (in seconds) a home is polled at the active interval after a command was sent.
+ACTIVE_PERIOD = 60
+
+# Polling profiles: the regular intervals apply while active, while the night and away profiles
+# slow polling down (commands are still followed at the active interval).
+PROFILE_ACTIVE = "active"
+PROFILE_NIGHT = "night"
+PROFILE_AWAY = "away"
+
 ACCEPT_HEADER = "Accept"
 ACCEPT_HEADER_JSON = "application/json"
+ACCEPT_ENCODING_HEADER = "Accept-Encoding"
+ACCEPT_ENCODING_HEADER_COMPRESSED = "gzip, deflate"
 AUTHORIZATION_HEADER = "Authorization"
 AUTHORIZATION_HEADER_BEARER = "Bearer"
 DEFAULT_HEADERS = {ACCEPT_HEADER: ACCEPT_HEADER_JSON}
@@ -39,6 +126,9 @@ MODEL_NBR = "Rolling shutter"
 MODEL_NBO = "Orientable shutter"
 MODEL_NBS = "Swinging shutter"
 
+GATEWAY_TYPES = ["NBG"]
+SHUTTER_TYPES = ["NBR", "NBO", "NBS"]
+
 MODELS = {
     "NBG": MODEL_NBG,
     "NBR": MODEL_NBR,
@@ -48,8 +138,14 @@ MODELS = {
 
 TYPE_SECURITY = "security"
 
-AUTH = "idiamant_auth"
+SERVICE_SET_POSITIONS = "set_positions"
+ATTR_POSITIONS = "positions"
+ATTR_TIMEOUT = "timeout"
+EVENT_POSITIONS_SET = f"{DOMAIN}_positions_set"
+# Time (in seconds) the positions set through the service are waited for, by default.
+DEFAULT_CONFIRMATION_TIMEOUT = 90
 
-DATA_HOMES = ("idiamant_homes",)
-DATA_ROOMS = ("idiamant_rooms",)
-DATA_MODULES = ("idiamant_modules",)
+AUTH = "idiamant_auth"
+DATA_HANDLER = "idiamant_data_handler"
+DATA_ROOM_GROUPS = "idiamant_room_groups"
+DATA_SCHEDULER = "idiamant_scheduler"
@@ -0,0 +1,388 @@
+"""
+Cover platform for iDiamant.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from homeassistant.components.cover import (
+    ATTR_POSITION,
+    SUPPORT_CLOSE,
+    SUPPORT_OPEN,
+    SUPPORT_SET_POSITION,
+    SUPPORT_STOP,
+    CoverDeviceClass,
+    CoverEntity,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from . import api
+from .const import DATA_HANDLER, DATA_ROOM_GROUPS, DOMAIN
+from .data_handler import IDiamantDataHandler
+from .entity import IdiamantEntity, IdiamantModuleEntity, async_subscribe_entities
+from .store import IDiamantStore, ModuleRecord
+
+_LOGGER = logging.getLogger(__name__)
+
+POSITION_CLOSED = 0
+POSITION_OPEN = 100
+POSITION_STOP = -1
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """
+    Set up the covers of every module of the topology, and a group cover for each room and each
+    home, in a single pass.
+    """
+
+    data_handler: IDiamantDataHandler = hass.data[DOMAIN][entry.entry_id][DATA_HANDLER]
+    store = data_handler.store
+
+    # The room of each room group cover, by unique id, for the services to find its modules.
+    room_groups: dict[str, str] = {}
+    hass.data[DOMAIN][entry.entry_id][DATA_ROOM_GROUPS] = room_groups
+
+    entities: list[IdiamantEntity] = [
+        IdiamantCover(data_handler, module) for module in store.modules.values()
+    ]
+
+    for home in store.homes.values():
+        for room in (store.rooms[room_id] for room_id in home.room_ids):
+            if modules := store.get_room_modules(room.id):
+                unique_id = f"{home.id}-{room.id}"
+                room_groups[unique_id] = room.id
+                entities.append(
+                    IdiamantGroupCover(
+                        data_handler,
+                        room.id,
+                        unique_id,
+                        home.id,
+                        room.name,
+                        modules,
+                    )
+                )
+
+        if modules := store.get_home_modules(home.id):
+            entities.append(
+                IdiamantGroupCover(
+                    data_handler, home.id, home.id, home.id, home.name, modules
+                )
+            )
+
+    async_add_entities(entities)
+
+    await async_subscribe_entities(hass, entry, data_handler, entities)
+
+
+def get_cover_modules(
+    store: IDiamantStore, room_groups: dict[str, str], unique_id: str
+) -> list[ModuleRecord]:
+    """
+    Get the modules driven by the cover of given unique id: a single module, or the modules of a
+    room or of a home for a group cover.
+
+    Args:
+        room_groups (dict): The room of each room group cover, by unique id.
+    """
+
+    if module := store.modules.get(unique_id):
+        return [module]
+
+    if unique_id in store.homes:
+        return store.get_home_modules(unique_id)
+
+    if room_id := room_groups.get(unique_id):
+        return store.get_room_modules(room_id)
+
+    return []
+
+
+class IdiamantCover(IdiamantModuleEntity, CoverEntity):
+    """
+    A shutter driven by an iDiamant gateway.
+    """
+
+    _attr_device_class = CoverDeviceClass.SHUTTER
+    _attr_supported_features = (
+        SUPPORT_OPEN | SUPPORT_CLOSE | SUPPORT_STOP | SUPPORT_SET_POSITION
+    )
+
+    @property
+    def current_cover_position(self) -> int | None:
+        """
+        Return the current position of the cover, from 0 (closed) to 100 (open).
+        """
+
+        if (module := self.module) is None:
+            return None
+
+        return module.current_position
+
+    @property
+    def is_closed(self) -> bool | None:
+        """
+        Return whether the cover is closed.
+        """
+
+        if (position := self.current_cover_position) is None:
+            return None
+
+        return position == POSITION_CLOSED
+
+    @property
+    def is_opening(self) -> bool:
+        """
+        Return whether the cover is opening.
+        """
+
+        module = self.module
+
+        return (
+            module is not None
+            and None not in (module.current_position, module.target_position)
+            and module.target_position > module.current_position
+        )
+
+    @property
+    def is_closing(self) -> bool:
+        """
+        Return whether the cover is closing.
+        """
+
+        module = self.module
+
+        return (
+            module is not None
+            and None not in (module.current_position, module.target_position)
+            and POSITION_CLOSED <= module.target_position < module.current_position
+        )
+
+    async def async_open_cover(self, **kwargs: Any) -> None:
+        """
+        Open the cover.
+        """
+
+        await self._async_set_target_position(POSITION_OPEN)
+
+    async def async_close_cover(self, **kwargs: Any) -> None:
+        """
+        Close the cover.
+        """
+
+        await self._async_set_target_position(POSITION_CLOSED)
+
+    async def async_stop_cover(self, **kwargs: Any) -> None:
+        """
+        Stop the cover.
+        """
+
+        await self._async_set_target_position(POSITION_STOP)
+
+    async def async_set_cover_position(self, **kwargs: Any) -> None:
+        """
+        Move the cover to a specific position.
+        """
+
+        await self._async_set_target_position(kwargs[ATTR_POSITION])
+
+    async def _async_set_target_position(self, target_position: int) -> None:
+        """
+        Send the target position of the module.
+        """
+
+        await async_set_target_positions(
+            self.data_handler, self.home_id, (self.record_id,), target_position
+        )
+
+
+class IdiamantGroupCover(IdiamantEntity, CoverEntity):
+    """
+    The shutters of a room or of a whole home, driven by a single command.
+    Its state is aggregated incrementally from the states of its members, as they change.
+    """
+
+    _attr_device_class = CoverDeviceClass.SHUTTER
+    _attr_supported_features = (
+        SUPPORT_OPEN | SUPPORT_CLOSE | SUPPORT_STOP | SUPPORT_SET_POSITION
+    )
+
+    def __init__(
+        self,
+        data_handler: IDiamantDataHandler,
+        group_id: str,
+        unique_id: str,
+        home_id: str,
+        name: str | None,
+        modules: list[ModuleRecord],
+    ) -> None:
+        super().__init__(data_handler, group_id)
+
+        self.home_id = home_id
+        self._attr_unique_id = unique_id
+        self._attr_name = name
+        self._member_ids = tuple(sorted(module.id for module in modules))
+        self._members: dict[str, tuple[int | None, bool]] = {}
+        self._known = 0
+        self._closed = 0
+        self._positions_sum = 0
+        self._reachable = 0
+
+        for module in modules:
+            self._update_member(module.id, module)
+
+    @property
+    def tracked_ids(self) -> tuple[str, ...]:
+        """
+        Return the ids of the member modules.
+        """
+
+        return self._member_ids
+
+    def _update_member(self, module_id: str, module: ModuleRecord | None) -> None:
+        """
+        Replace the contribution of a member to the aggregated state by its current one.
+        """
+
+        previous_position, previous_reachable = self._members.get(
+            module_id, (None, False)
+        )
+
+        if previous_position is not None:
+            self._known -= 1
+            self._positions_sum -= previous_position
+            self._closed -= previous_position == POSITION_CLOSED
+
+        self._reachable -= previous_reachable
+
+        position = module.current_position if module is not None else None
+        if position is not None and position < POSITION_CLOSED:
+            position = None
+
+        reachable = module is not None and module.reachable is not False
+
+        if position is not None:
+            self._known += 1
+            self._positions_sum += position
+            self._closed += position == POSITION_CLOSED
+
+        self._reachable += reachable
+        self._members[module_id] = (position, reachable)
+
+    @callback
+    def async_write_changed_state(self, record_ids: list[str]) -> None:
+        """
+        Update the aggregated state from the members that changed, then write it.
+        """
+
+        modules = self.data_handler.store.modules
+        for module_id in record_ids:
+            self._update_member(module_id, modules.get(module_id))
+
+        super().async_write_changed_state(record_ids)
+
+    @property
+    def available(self) -> bool:
+        """
+        Return whether at least one member can be reached.
+        """
+
+        return self._reachable > 0
+
+    @property
+    def current_cover_position(self) -> int | None:
+        """
+        Return the average position of the members whose position is known.
+        """
+
+        if not self._known:
+            return None
+
+        return round(self._positions_sum / self._known)
+
+    @property
+    def is_closed(self) -> bool | None:
+        """
+        Return whether every member whose position is known is closed.
+        """
+
+        if not self._known:
+            return None
+
+        return self._closed == self._known
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """
+        Return the state attributes.
+        """
+
+        return {
+            **super().extra_state_attributes,
+            "members": len(self._member_ids),
+        }
+
+    async def async_open_cover(self, **kwargs: Any) -> None:
+        """
+        Open every member.
+        """
+
+        await self._async_set_target_position(POSITION_OPEN)
+
+    async def async_close_cover(self, **kwargs: Any) -> None:
+        """
+        Close every member.
+        """
+
+        await self._async_set_target_position(POSITION_CLOSED)
+
+    async def async_stop_cover(self, **kwargs: Any) -> None:
+        """
+        Stop every member.
+        """
+
+        await self._async_set_target_position(POSITION_STOP)
+
+    async def async_set_cover_position(self, **kwargs: Any) -> None:
+        """
+        Move every member to a specific position.
+        """
+
+        await self._async_set_target_position(kwargs[ATTR_POSITION])
+
+    async def _async_set_target_position(self, target_position: int) -> None:
+        """
+        Send the target position of every member in a single command.
+        """
+
+        await async_set_target_positions(
+            self.data_handler, self.home_id, self._member_ids, target_position
+        )
+
+
+async def async_set_target_positions(
+    data_handler: IDiamantDataHandler,
+    home_id: str,
+    module_ids: tuple[str, ...],
+    target_position: int,
+) -> None:
+    """
+    Send the same target position to several modules of a home, in a single command.
+
+    Raises:
+        HomeAssistantError: When the command could not be sent.
+    """
+
+    try:
+        await data_handler.async_set_state(
+            home_id, {module_id: target_position for module_id in module_ids}
+        )
+
+    except api.ApiError as err:
+        raise HomeAssistantError(str(err)) from err
@@ -0,0 +1,142 @@
+"""
+The iDiamant data classes, fetching the data from the Netatmo Connect API.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from . import api
+from .const import (
+    GATEWAY_TYPES,
+    HOMESDATA_PATH,
+    HOMESTATUS_PATH,
+    SHUTTER_TYPES,
+)
+from .store import IDiamantStore
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AsyncGatewayData:
+    """
+    Fetch the topology of every home of the account and the status of their gateways.
+    """
+
+    def __init__(
+        self,
+        auth: api.AsyncConfigEntryNetatmoAuth,
+        store: IDiamantStore,
+        home_ids: list[str] | None = None,
+    ) -> None:
+        """
+        Initialize the data class.
+
+        Args:
+            home_ids (list, optional): The homes to track. Every home of the account is tracked
+                                       when empty.
+                                       Defaults to [].
+        """
+
+        self.auth = auth
+        self.store = store
+        self.home_ids = set(home_ids or [])
+        self.changed_ids: set[str] = set()
+
+    async def async_update(self) -> None:
+        """
+        Fetch the topology of the tracked homes, then the firmware and connectivity of their
+        gateways. The status of the shutters is left to the shutter data classes.
+
+        Raises:
+            ApiError: When the API could not be reached.
+        """
+
+        # A failed update changes nothing, and the homes updated before it failed are still told.
+        self.changed_ids = set()
+
+        params = {"gateway_types": ",".join(GATEWAY_TYPES)}
+        if len(self.home_ids) == 1:
+            params["home_id"] = next(iter(self.home_ids))
+
+        homes_data = await self.auth.async_request("GET", HOMESDATA_PATH, params=params)
+
+        if homes_data is None:
+            raise api.ApiError("Unable to fetch the homes data")
+
+        homes = [
+            home
+            for home in homes_data["body"]["homes"]
+            if not self.home_ids or home["id"] in self.home_ids
+        ]
+        for home in homes:
+            self.store.update_topology(home)
+
+        for home_id in set(self.store.homes) - {home["id"] for home in homes}:
+            self.store.remove_home(home_id)
+
+        for home_id in list(self.store.homes):
+            home_status = await self.auth.async_request(
+                "GET",
+                HOMESTATUS_PATH,
+                params={"home_id": home_id, "device_types": ",".join(GATEWAY_TYPES)},
+            )
+
+            if home_status is None:
+                raise api.ApiError(f"Unable to fetch the status of home {home_id}")
+
+            self.changed_ids |= self.store.update_status(
+                home_status["body"]["home"], GATEWAY_TYPES
+            )
+
+
+class AsyncShutterData:
+    """
+    Fetch the status of the shutters of a home.
+    """
+
+    def __init__(
+        self, auth: api.AsyncConfigEntryNetatmoAuth, store: IDiamantStore, home_id: str
+    ) -> None:
+        """
+        Initialize the data class.
+        """
+
+        self.auth = auth
+        self.store = store
+        self.home_id = home_id
+        self.changed_ids: set[str] = set()
+
+    @property
+    def changed(self) -> bool:
+        """
+        Return whether the last update changed the status of any module.
+        """
+
+        return bool(self.changed_ids)
+
+    async def async_update(self) -> None:
+        """
+        Fetch the status of the shutters of the home.
+        Only the shutter types are requested, so that the other devices of mixed Netatmo accounts
+        are neither sent nor decoded.
+
+        Raises:
+            ApiError: When the API could not be reached.
+        """
+
+        # A failed update changes nothing.
+        self.changed_ids = set()
+
+        home_status = await self.auth.async_request(
+            "GET",
+            HOMESTATUS_PATH,
+            params={"home_id": self.home_id, "device_types": ",".join(SHUTTER_TYPES)},
+        )
+
+        if home_status is None:
+            raise api.ApiError(f"Unable to fetch the status of home {self.home_id}")
+
+        self.changed_ids = self.store.update_status(
+            home_status["body"]["home"], SHUTTER_TYPES
+        )
@@ -6,37 +6,139 @@ from __future__ import annotations
 
 import asyncio
 from collections import deque
+from collections.abc import Coroutine, Mapping
 from dataclasses import dataclass
+import datetime as dt
 import logging
+from math import inf
+import random
 from time import time
 from typing import Any
+from zlib import crc32
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.const import STATE_NOT_HOME, STATE_OFF
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, State, callback
+from homeassistant.helpers.event import (
+    async_track_state_change_event,
+    async_track_time_change,
+)
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
 
-from . import api, SCAN_INTERVAL
+from . import api
 from .const import (
+    ACTIVE_PERIOD,
     AUTH,
+    CONF_ACTIVE_INTERVAL,
+    CONF_AWAY_INTERVAL,
+    CONF_GATEWAY_INTERVAL,
+    CONF_HEDGE_REQUESTS,
+    CONF_HOMES,
+    CONF_HOURLY_REQUEST_BUDGET,
+    CONF_IDLE_INTERVAL,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_NIGHT_END,
+    CONF_NIGHT_INTERVAL,
+    CONF_NIGHT_START,
+    CONF_PRESENCE_ENTITY,
+    CONF_REQUEST_TIMEOUT,
+    CONF_SHUTTER_INTERVAL,
+    DATA_SCHEDULER,
+    DEFAULT_GATEWAY_INTERVAL,
+    DEFAULT_OPTIONS,
+    DEFAULT_SHUTTER_INTERVAL,
     DOMAIN,
+    PROFILE_ACTIVE,
+    PROFILE_AWAY,
+    PROFILE_NIGHT,
+    QUIET_PERIOD,
+    SETSTATE_PATH,
 )
+from .data_classes import AsyncGatewayData, AsyncShutterData
+from .store import IDiamantStore
 
 _LOGGER = logging.getLogger(__name__)
 
 
-# GATEWAY_DATA_CLASS_NAME = "AsyncGatewayData"
+GATEWAY_DATA_CLASS_NAME = "AsyncGatewayData"
 SHUTTER_DATA_CLASS_NAME = "AsyncShutterData"
 
 DATA_CLASSES = {
-    # GATEWAY_DATA_CLASS_NAME: None,
-    SHUTTER_DATA_CLASS_NAME: None,
+    GATEWAY_DATA_CLASS_NAME: AsyncGatewayData,
+    SHUTTER_DATA_CLASS_NAME: AsyncShutterData,
 }
 
 DEFAULT_INTERVALS = {
-    # GATEWAY_DATA_CLASS_NAME: 600,
-    SHUTTER_DATA_CLASS_NAME: 60,
+    GATEWAY_DATA_CLASS_NAME: DEFAULT_GATEWAY_INTERVAL,
+    SHUTTER_DATA_CLASS_NAME: DEFAULT_SHUTTER_INTERVAL,
+}
+
+INTERVAL_OPTIONS = {
+    GATEWAY_DATA_CLASS_NAME: CONF_GATEWAY_INTERVAL,
+    SHUTTER_DATA_CLASS_NAME: CONF_SHUTTER_INTERVAL,
 }
 
+PROFILE_INTERVAL_OPTIONS = {
+    PROFILE_NIGHT: CONF_NIGHT_INTERVAL,
+    PROFILE_AWAY: CONF_AWAY_INTERVAL,
+}
+
+# State of a zone nobody is in.
+ZONE_EMPTY = "0"
+
+TOPOLOGY_STORAGE_VERSION = 1
+# Delay (in seconds) before writing the topology cache, to group the writes.
+TOPOLOGY_SAVE_DELAY = 10
+
+# Margin (in seconds) under which a data class due right after an update is scanned by it.
+TICK_TOLERANCE = 1
+
+# Share of the interval by which a scan is moved at random, up to `MAX_JITTER` seconds.
+JITTER_RATIO = 0.05
+MAX_JITTER = 5
+# Time (in seconds) over which the first scans after a setup are spread.
+STARTUP_WINDOW = 20
+# Maximum number of times the interval of a failing data class is doubled.
+MAX_BACKOFF_EXPONENT = 4
+
+
+def get_topology_cache(hass: HomeAssistant, config_entry: ConfigEntry) -> Store:
+    """
+    Get the storage caching the topology of the homes of given config entry.
+    """
+
+    return Store(
+        hass, TOPOLOGY_STORAGE_VERSION, f"{DOMAIN}.{config_entry.entry_id}.topology"
+    )
+
+
+def get_phase(data_class_entry: str) -> float:
+    """
+    Get the phase of a data class entry within its interval, from 0 to 1.
+    It only depends on the entry, so that each home keeps its own slot across restarts.
+    """
+
+    return crc32(data_class_entry.encode()) / 0x100000000
+
+
+def is_away(state: State | None) -> bool:
+    """
+    Tell whether the state of a presence entity means nobody is home: a person or a device
+    tracker away, a group or an input boolean off, or an empty zone.
+    An unknown entity never selects the away profile.
+    """
+
+    return state is not None and state.state in (STATE_NOT_HOME, STATE_OFF, ZONE_EMPTY)
+
+
+def get_shutter_data_class_entry(home_id: str) -> str:
+    """
+    Get the entry of the shutter data class of given home.
+    """
+
+    return f"{SHUTTER_DATA_CLASS_NAME}-{home_id}"
+
 
 @dataclass
 class IDiamantDevice:
@@ -56,9 +158,13 @@ class IDiamantDataClass:
     """
 
     name: str
+    class_name: str
     interval: int
     next_scan: float
     subscriptions: list[CALLBACK_TYPE | None]
+    active_until: float = 0
+    last_change: float = 0
+    failures: int = 0
 
 
 class IDiamantDataHandler:
@@ -70,44 +176,405 @@ class IDiamantDataHandler:
         self.hass = hass
         self.config_entry = config_entry
         self._auth = hass.data[DOMAIN][config_entry.entry_id][AUTH]
+        self._scheduler = hass.data[DOMAIN][DATA_SCHEDULER]
         self.data_classes: dict = {}
         self.data: dict = {}
+        self.store = IDiamantStore()
+        self.options: dict = {**DEFAULT_OPTIONS, **config_entry.options}
         self._queue: deque = deque()
+        self._topology_cache = get_topology_cache(hass, config_entry)
+        self._saved_topology_hash: int | None = None
+        self._topology_save_pending = False
+        self._tasks: set[asyncio.Task] = set()
+        self._closed = False
+        self.profile = PROFILE_ACTIVE
+        self._profile_listeners: list[CALLBACK_TYPE] = []
 
     async def async_setup(self) -> None:
         """
-        Set up the iDiamant data handler.
+        Set up the iDiamant data handler and load the topology of the homes, from the cache when
+        available or from the API otherwise.
+        No status is fetched here: the data classes are due within the startup window, each at
+        its own phase, and polled in the background once the data handler is started.
+
+        Raises:
+            ApiError: When the topology could not be fetched.
         """
 
-        async_track_time_interval(self.hass, self.async_update, SCAN_INTERVAL)
+        self.async_apply_options(self.config_entry.options)
 
-        await asyncio.gather(
-            *[
-                self.register_data_class(data_class, data_class, None)
-                for data_class in (
-                    GATEWAY_DATA_CLASS_NAME,
-                    SHUTTER_DATA_CLASS_NAME,
-                )
-            ]
+        self._async_add_data_class(
+            GATEWAY_DATA_CLASS_NAME,
+            GATEWAY_DATA_CLASS_NAME,
+            None,
+            home_ids=self.options[CONF_HOMES],
+        )
+
+        cached_topology = await self._topology_cache.async_load()
+
+        # The cache may hold homes no longer selected, and lacks the homes newly selected.
+        if cached_topology and (home_ids := self.options[CONF_HOMES]):
+            if set(home_ids) <= {home["id"] for home in cached_topology}:
+                cached_topology = [
+                    home for home in cached_topology if home["id"] in home_ids
+                ]
+            else:
+                cached_topology = None
+
+        if cached_topology:
+            for home in cached_topology:
+                self.store.update_topology(home)
+
+            self._saved_topology_hash = self.store.get_topology_hash()
+
+            _LOGGER.debug(
+                "Topology of %s homes loaded from cache", len(cached_topology)
+            )
+
+        else:
+            await self.data[GATEWAY_DATA_CLASS_NAME].async_update()
+
+            self.data_classes[GATEWAY_DATA_CLASS_NAME].next_scan = self._get_next_scan(
+                self.data_classes[GATEWAY_DATA_CLASS_NAME]
+            )
+            self._async_save_topology()
+
+        # The shutters are polled for the homes discovered by the gateway data class.
+        for home_id in self.store.homes:
+            self._async_add_data_class(
+                SHUTTER_DATA_CLASS_NAME,
+                get_shutter_data_class_entry(home_id),
+                None,
+                home_id=home_id,
+            )
+
+    @callback
+    def async_start(self) -> None:
+        """
+        Start polling the data classes.
+        """
+
+        self._scheduler.async_register(self)
+
+    @callback
+    def async_dispatch_update(self) -> None:
+        """
+        Poll the data classes due in the background, on behalf of the scheduler.
+        """
+
+        if not self._closed:
+            self.async_create_task(self.async_update())
+
+    @callback
+    def async_create_task(self, target: Coroutine) -> asyncio.Task:
+        """
+        Run a coroutine in a task owned by the data handler, cancelled when it shuts down.
+        """
+
+        task = self.hass.async_create_task(target)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        return task
+
+    async def async_shutdown(self) -> None:
+        """
+        Stop polling, cancel the polls and commands in flight, then write the topology still
+        waiting to be cached.
+        Nothing of the data handler is left running once the config entry is unloaded.
+        """
+
+        self._closed = True
+        self._scheduler.async_unregister(self)
+        self._async_untrack_profile()
+
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for data_class in self.data_classes.values():
+            data_class.subscriptions.clear()
+
+        if self._topology_save_pending:
+            self._topology_save_pending = False
+            await self._topology_cache.async_save(self.store.export_topology())
+
+    @property
+    def next_due(self) -> float:
+        """
+        Return the time at which the next data class is due, once the hourly budget allows it.
+        """
+
+        next_scan = min(
+            (data_class.next_scan for data_class in self._queue), default=inf
         )
 
-    async def async_update(self) -> None:
+        return max(next_scan, self._auth.limiter.next_available)
+
+    async def async_update(self, event_time: Any = None) -> None:
         """
         Update device.
         """
 
-        for data_class in self._queue:
-            if data_class.next_scan > time():
+        for data_class in list(self._queue):
+            if data_class.next_scan > time() + TICK_TOLERANCE:
                 continue
 
+            if not self._auth.limiter.remaining:
+                _LOGGER.debug("Hourly request budget exhausted, skipping this update")
+
+                break
+
             if data_class_name := data_class.name:
-                self.data_classes[data_class_name].next_scan = (
-                    time() + data_class.interval
-                )
+                data_class.next_scan = time() + data_class.interval
 
                 await self.async_fetch_data(data_class_name)
 
+                data_class.interval = self._get_interval(data_class)
+                data_class.next_scan = self._get_next_scan(data_class)
+
         self._queue.rotate(1)
+        self._scheduler.async_schedule()
+
+    @callback
+    def async_apply_options(self, options: Mapping[str, Any]) -> None:
+        """
+        Apply the options of the config entry to the running data handler.
+        """
+
+        self.options = {**DEFAULT_OPTIONS, **options}
+
+        self._auth.configure(
+            max_concurrent=self.options[CONF_MAX_CONCURRENT_REQUESTS],
+            timeout=self.options[CONF_REQUEST_TIMEOUT],
+            hourly_budget=self.options[CONF_HOURLY_REQUEST_BUDGET],
+            hedge_requests=self.options[CONF_HEDGE_REQUESTS],
+        )
+
+        self._async_track_profile()
+        self.profile = self._get_profile()
+        self._async_reschedule()
+
+    @callback
+    def _async_reschedule(self) -> None:
+        """
+        Update the interval of every data class, and bring their next scan forward when it got
+        shorter.
+        """
+
+        now = time()
+        for data_class in self.data_classes.values():
+            data_class.interval = self._get_interval(data_class)
+            data_class.next_scan = min(data_class.next_scan, now + data_class.interval)
+
+        self._scheduler.async_schedule()
+
+    @callback
+    def _async_track_profile(self) -> None:
+        """
+        Follow the night schedule and the presence entity that select the polling profile.
+        """
+
+        self._async_untrack_profile()
+
+        if self._closed:
+            return
+
+        if entity_id := self.options[CONF_PRESENCE_ENTITY]:
+            self._profile_listeners.append(
+                async_track_state_change_event(
+                    self.hass, [entity_id], self._async_update_profile
+                )
+            )
+
+        for switch_time in self._get_night() or ():
+            self._profile_listeners.append(
+                async_track_time_change(
+                    self.hass,
+                    self._async_update_profile,
+                    hour=switch_time.hour,
+                    minute=switch_time.minute,
+                    second=switch_time.second,
+                )
+            )
+
+    @callback
+    def _async_untrack_profile(self) -> None:
+        """
+        Stop following the night schedule and the presence entity.
+        """
+
+        while self._profile_listeners:
+            self._profile_listeners.pop()()
+
+    @callback
+    def _async_update_profile(self, *_: Any) -> None:
+        """
+        Select the polling profile again, when the night starts or ends or the presence changes.
+        """
+
+        if (profile := self._get_profile()) == self.profile:
+            return
+
+        _LOGGER.debug("Polling profile %s selected", profile)
+
+        self.profile = profile
+        self._async_reschedule()
+
+    def _get_night(self) -> tuple[dt.time, dt.time] | None:
+        """
+        Return the (local) start and end of the night, or None when no night is set.
+        """
+
+        start = dt_util.parse_time(self.options[CONF_NIGHT_START])
+        end = dt_util.parse_time(self.options[CONF_NIGHT_END])
+
+        if start is None or end is None or start == end:
+            return None
+
+        return start, end
+
+    def _get_profile(self) -> str:
+        """
+        Return the polling profile to use now: away when the presence entity says nobody is home,
+        night during the night, active otherwise.
+        """
+
+        if (entity_id := self.options[CONF_PRESENCE_ENTITY]) and is_away(
+            self.hass.states.get(entity_id)
+        ):
+            return PROFILE_AWAY
+
+        if night := self._get_night():
+            start, end = night
+            now = dt_util.now().time()
+
+            # The night usually spans midnight.
+            if (start <= now < end) if start < end else (now >= start or now < end):
+                return PROFILE_NIGHT
+
+        return PROFILE_ACTIVE
+
+    @callback
+    def async_set_active(self, data_class_entry: str) -> None:
+        """
+        Poll given data class entry at the active interval for a while, after a command was sent.
+        """
+
+        data_class = self.data_classes[data_class_entry]
+        data_class.active_until = time() + ACTIVE_PERIOD
+        data_class.interval = self._get_interval(data_class)
+        data_class.next_scan = min(data_class.next_scan, time() + data_class.interval)
+
+        self._scheduler.async_schedule()
+
+    async def async_set_state(self, home_id: str, targets: Mapping[str, int]) -> None:
+        """
+        Send the target positions of several modules of a home in a single command, then follow
+        them at the active interval.
+
+        Args:
+            home_id (str): The home of the modules.
+            targets (dict): The target position of each module, by module id. -1 stops a module.
+
+        Raises:
+            ApiError: When the command could not be sent.
+        """
+
+        modules = []
+        for module_id, target_position in targets.items():
+            module = {"id": module_id, "target_position": target_position}
+
+            if bridge_id := self.store.module_bridge.get(module_id):
+                module["bridge"] = bridge_id
+
+            modules.append(module)
+
+        # The command is owned by the data handler, so that an unload does not leave it running.
+        command = self.async_create_task(
+            self._auth.async_request(
+                "POST",
+                SETSTATE_PATH,
+                body={"home": {"id": home_id, "modules": modules}},
+            )
+        )
+
+        try:
+            await asyncio.wait({command})
+
+        except asyncio.CancelledError:
+            command.cancel()
+
+            raise
+
+        if command.cancelled():
+            raise api.ApiError(f"Command to home {home_id} cancelled by the unload")
+
+        if command.result() is None:
+            raise api.ApiError(f"Unable to set the state of home {home_id}")
+
+        if (data_class_entry := get_shutter_data_class_entry(home_id)) in (
+            self.data_classes
+        ):
+            self.async_set_active(data_class_entry)
+
+    def _get_interval(self, data_class: IDiamantDataClass) -> int:
+        """
+        Return the interval at which given data class should currently be polled.
+        The interval of a failing data class is doubled on each failure, then halved on each
+        success, so that the homes come back gradually once the API recovers.
+        """
+
+        return self._get_base_interval(data_class) * 2**data_class.failures
+
+    def _get_base_interval(self, data_class: IDiamantDataClass) -> int:
+        """
+        Return the interval at which given data class should be polled when it does not fail.
+        """
+
+        now = time()
+
+        if data_class.class_name != SHUTTER_DATA_CLASS_NAME:
+            interval = self.options[INTERVAL_OPTIONS[data_class.class_name]]
+
+        elif data_class.active_until > now:
+            # Commands are followed closely, whatever the profile.
+            return self.options[CONF_ACTIVE_INTERVAL]
+
+        elif data_class.last_change and now - data_class.last_change > QUIET_PERIOD:
+            interval = self.options[CONF_IDLE_INTERVAL]
+
+        else:
+            interval = self.options[CONF_SHUTTER_INTERVAL]
+
+        # The night and away profiles only ever slow polling down.
+        if profile_option := PROFILE_INTERVAL_OPTIONS.get(self.profile):
+            return max(interval, self.options[profile_option])
+
+        return interval
+
+    @staticmethod
+    def _get_next_scan(data_class: IDiamantDataClass) -> float:
+        """
+        Return the time of the next scan of given data class.
+        Scans are aligned on the phase of the data class, so that the homes stay spread over the
+        interval instead of drifting towards the same instant, then jittered.
+        """
+
+        now = time()
+        interval = data_class.interval
+
+        delay = (get_phase(data_class.name) * interval - now) % interval
+
+        # Scanning again right away when the interval just changed would waste a request.
+        if delay < interval / 2:
+            delay += interval
+
+        jitter = min(interval * JITTER_RATIO, MAX_JITTER)
+
+        return now + delay + random.uniform(-jitter, jitter)
 
     @callback
     def async_force_update(self, data_class_entry: str) -> None:
@@ -117,27 +584,43 @@ class IDiamantDataHandler:
 
         self.data_classes[data_class_entry].next_scan = time()
         self._queue.rotate(-(self._queue.index(self.data_classes[data_class_entry])))
+        self._scheduler.async_schedule()
 
     async def async_fetch_data(self, data_class_entry: str) -> None:
         """
         Fetch data and notify.
         """
 
-        if self.data[data_class_entry] is None:
+        if self._closed or self.data[data_class_entry] is None:
             return
 
+        data_class = self.data_classes[data_class_entry]
+
         try:
             await self.data[data_class_entry].async_update()
 
         except api.ApiError as err:
             _LOGGER.debug(err)
 
+            data_class.failures = min(data_class.failures + 1, MAX_BACKOFF_EXPONENT)
+
         except asyncio.TimeoutError as err:
             _LOGGER.debug(err)
 
+            data_class.failures = min(data_class.failures + 1, MAX_BACKOFF_EXPONENT)
+
             return
 
-        for update_callback in self.data_classes[data_class_entry].subscriptions:
+        else:
+            data_class.failures = max(data_class.failures - 1, 0)
+
+        if getattr(self.data[data_class_entry], "changed", False):
+            data_class.last_change = time()
+
+        if data_class.class_name == GATEWAY_DATA_CLASS_NAME:
+            self._async_save_topology()
+
+        for update_callback in data_class.subscriptions:
             if update_callback:
                 update_callback()
 
@@ -160,29 +643,80 @@ class IDiamantDataHandler:
 
             return
 
-        self.data_classes[data_class_entry] = IDiamantDataClass(
-            name=data_class_entry,
-            interval=DEFAULT_INTERVALS[data_class_name],
-            next_scan=time() + DEFAULT_INTERVALS[data_class_name],
-            subscriptions=[update_callback],
-        )
-
-        self.data[data_class_entry] = DATA_CLASSES[data_class_name](
-            self._auth, **kwargs
+        self._async_add_data_class(
+            data_class_name, data_class_entry, update_callback, **kwargs
         )
 
         try:
             await self.async_fetch_data(data_class_entry)
 
         except KeyError:
+            self._queue.remove(self.data_classes[data_class_entry])
             self.data_classes.pop(data_class_entry)
 
             raise
 
+    @callback
+    def _async_add_data_class(
+        self,
+        data_class_name: str,
+        data_class_entry: str,
+        update_callback: CALLBACK_TYPE | None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Add a data class, due within the startup window (at its phase), without fetching its
+        data.
+        """
+
+        interval = self.options.get(
+            INTERVAL_OPTIONS[data_class_name], DEFAULT_INTERVALS[data_class_name]
+        )
+
+        self.data_classes[data_class_entry] = IDiamantDataClass(
+            name=data_class_entry,
+            class_name=data_class_name,
+            interval=interval,
+            next_scan=time()
+            + get_phase(data_class_entry) * min(interval, STARTUP_WINDOW),
+            subscriptions=[update_callback],
+            last_change=time(),
+        )
+
+        self.data[data_class_entry] = DATA_CLASSES[data_class_name](
+            self._auth, self.store, **kwargs
+        )
+
         self._queue.append(self.data_classes[data_class_entry])
+        self._scheduler.async_schedule()
 
         _LOGGER.debug("Data class %s added", data_class_entry)
 
+    @callback
+    def _async_save_topology(self) -> None:
+        """
+        Save the topology in the cache, if it changed.
+        Only a hash of the saved topology is kept, it is exported when written.
+        """
+
+        topology_hash = self.store.get_topology_hash()
+
+        if topology_hash != self._saved_topology_hash:
+            self._saved_topology_hash = topology_hash
+            self._topology_save_pending = True
+            self._topology_cache.async_delay_save(
+                self._get_topology_to_save, TOPOLOGY_SAVE_DELAY
+            )
+
+    def _get_topology_to_save(self) -> list[dict]:
+        """
+        Get the topology to write in the cache, once the save delay elapsed.
+        """
+
+        self._topology_save_pending = False
+
+        return self.store.export_topology()
+
     async def unregister_data_class(
         self, data_class_entry: str, update_callback: CALLBACK_TYPE | None
     ) -> None:
@@ -190,10 +724,15 @@ class IDiamantDataHandler:
         Unregister data class.
         """
 
-        self.data_classes[data_class_entry].subscriptions.remove(update_callback)
+        # The subscriptions are already cleared when the data handler shut down first.
+        data_class = self.data_classes.get(data_class_entry)
+        if data_class is None or update_callback not in data_class.subscriptions:
+            return
 
-        if not self.data_classes[data_class_entry].subscriptions:
-            self._queue.remove(self.data_classes[data_class_entry])
+        data_class.subscriptions.remove(update_callback)
+
+        if not data_class.subscriptions:
+            self._queue.remove(data_class)
             self.data_classes.pop(data_class_entry)
             self.data.pop(data_class_entry)
 
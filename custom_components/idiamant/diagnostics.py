@@ -0,0 +1,43 @@
+"""
+Diagnostics support for iDiamant.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from . import api
+from .const import AUTH, DATA_HANDLER, DOMAIN
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """
+    Return the diagnostics of a config entry: its options, the current polling profile, how many
+    requests were made during the last hour and, with a dedicated session, how often its
+    connections were reused.
+    """
+
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    auth: api.AsyncConfigEntryNetatmoAuth = entry_data[AUTH]
+
+    return {
+        "options": dict(entry.options),
+        "polling_profile": (
+            entry_data[DATA_HANDLER].profile if DATA_HANDLER in entry_data else None
+        ),
+        "requests": {
+            "used": auth.limiter.used,
+            "remaining": auth.limiter.remaining,
+            "hedged": auth.hedger.hedges,
+        },
+        "connections": (
+            auth.connection_stats.as_dict()
+            if auth.connection_stats is not None
+            else None
+        ),
+    }
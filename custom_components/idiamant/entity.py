@@ -2,48 +2,301 @@
 Entity class for iDiamant.
 """
 
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from __future__ import annotations
 
-from .const import DOMAIN, NAME, VERSION, MANUFACTURER
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
 
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.entity import DeviceInfo, Entity, EntityDescription
 
-class IdiamantEntity(CoordinatorEntity):
+from .const import DOMAIN, MANUFACTURER, MODELS
+from .data_handler import (
+    GATEWAY_DATA_CLASS_NAME,
+    SHUTTER_DATA_CLASS_NAME,
+    IDiamantDataHandler,
+    get_shutter_data_class_entry,
+)
+from .store import BridgeRecord, IDiamantStore, ModuleRecord
+
+
+def get_bridge_device_info(bridge: BridgeRecord) -> DeviceInfo:
+    """
+    Get the device information of a bridge.
+    """
+
+    return DeviceInfo(
+        identifiers={(DOMAIN, bridge.id)},
+        manufacturer=MANUFACTURER,
+        model=MODELS.get(bridge.type, bridge.type),
+        name=bridge.name,
+    )
+
+
+def get_module_device_info(module: ModuleRecord, store: IDiamantStore) -> DeviceInfo:
+    """
+    Get the device information of a module, linked to its bridge.
+    """
+
+    device_info = DeviceInfo(
+        identifiers={(DOMAIN, module.id)},
+        manufacturer=MANUFACTURER,
+        model=MODELS.get(module.type, module.type),
+        name=module.name,
+    )
+
+    if module.bridge_id in store.bridges:
+        device_info["via_device"] = (DOMAIN, module.bridge_id)
+
+    if room := store.rooms.get(module.room_id):
+        device_info["suggested_area"] = room.name
+
+    return device_info
+
+
+@callback
+def async_populate_devices(
+    hass: HomeAssistant, config_entry: ConfigEntry, store: IDiamantStore
+) -> None:
+    """
+    Create the devices of every bridge and module of the topology in a single pass, and remove the
+    devices that are no longer part of it.
+    """
+
+    device_registry = dr.async_get(hass)
+
+    # Bridges come first so that the modules can be linked to them.
+    for bridge in store.bridges.values():
+        device_registry.async_get_or_create(
+            config_entry_id=config_entry.entry_id, **get_bridge_device_info(bridge)
+        )
+
+    for module in store.modules.values():
+        device_registry.async_get_or_create(
+            config_entry_id=config_entry.entry_id,
+            **get_module_device_info(module, store),
+        )
+
+    known_identifiers = {
+        (DOMAIN, device_id) for device_id in (*store.bridges, *store.modules)
+    }
+
+    for device in dr.async_entries_for_config_entry(
+        device_registry, config_entry.entry_id
+    ):
+        if not device.identifiers & known_identifiers:
+            device_registry.async_remove_device(device.id)
+
+
+async def async_subscribe_entities(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    data_handler: IDiamantDataHandler,
+    entities: Iterable[IdiamantEntity],
+) -> None:
     """
-    The main iDiamant entity class.
+    Subscribe a whole platform to the data classes with a single callback per data class.
+    Only the entities of the bridges and modules that changed are written.
     """
 
-    def __init__(self, coordinator, config_entry):
-        super().__init__(coordinator)
-        self.config_entry = config_entry
+    entities_by_id: dict[str, list[IdiamantEntity]] = {}
+    for entity in entities:
+        for record_id in entity.tracked_ids:
+            entities_by_id.setdefault(record_id, []).append(entity)
+
+    data_class_entries = {GATEWAY_DATA_CLASS_NAME: GATEWAY_DATA_CLASS_NAME} | {
+        get_shutter_data_class_entry(home_id): SHUTTER_DATA_CLASS_NAME
+        for home_id in data_handler.store.homes
+    }
+
+    subscriptions = []
+    for data_class_entry, data_class_name in data_class_entries.items():
+
+        @callback
+        def async_write_changed(data_class_entry: str = data_class_entry) -> None:
+            data_class = data_handler.data.get(data_class_entry)
+            if data_class is None:
+                return
+
+            # Entities compare by entity id and cannot be hashed: they are grouped by identity.
+            changed_entities: dict[int, tuple[IdiamantEntity, list[str]]] = {}
+            for record_id in data_class.changed_ids:
+                for entity in entities_by_id.get(record_id, ()):
+                    changed_entities.setdefault(id(entity), (entity, []))[1].append(
+                        record_id
+                    )
+
+            for entity, record_ids in changed_entities.values():
+                entity.async_write_changed_state(record_ids)
+
+        await data_handler.register_data_class(
+            data_class_name, data_class_entry, async_write_changed
+        )
+        subscriptions.append((data_class_entry, async_write_changed))
+
+    @callback
+    def async_unsubscribe() -> None:
+        for data_class_entry, update_callback in subscriptions:
+            hass.async_create_task(
+                data_handler.unregister_data_class(data_class_entry, update_callback)
+            )
+
+    config_entry.async_on_unload(async_unsubscribe)
+
+
+class IdiamantEntity(Entity):
+    """
+    The main iDiamant entity class, bound to a bridge or a module of the store.
+    """
+
+    _attr_should_poll = False
+
+    def __init__(self, data_handler: IDiamantDataHandler, record_id: str) -> None:
+        self.data_handler = data_handler
+        self.record_id = record_id
 
     @property
-    def unique_id(self):
+    def tracked_ids(self) -> tuple[str, ...]:
         """
-        Return a unique ID to use for this entity.
+        Return the ids of the bridges and modules the state of the entity depends on.
         """
 
-        return self.config_entry.entry_id
+        return (self.record_id,)
 
-    @property
-    def device_info(self):
+    @callback
+    def async_write_changed_state(self, record_ids: list[str]) -> None:
         """
-        Return the device information.
+        Write the state of the entity after given tracked records changed, once added to Home
+        Assistant.
         """
 
-        return {
-            "identifiers": {(DOMAIN, self.unique_id)},
-            "manufacturer": MANUFACTURER,
-            "model": VERSION,
-            "name": NAME,
-        }
+        if self.hass is not None:
+            self.async_write_ha_state()
 
     @property
-    def device_state_attributes(self):
+    def extra_state_attributes(self) -> dict:
         """
         Return the state attributes.
         """
 
         return {
-            "id": str(self.coordinator.data.get("id")),
+            "id": self.record_id,
             "integration": DOMAIN,
         }
+
+
+class IdiamantModuleEntity(IdiamantEntity):
+    """
+    An iDiamant entity bound to a module.
+    """
+
+    def __init__(self, data_handler: IDiamantDataHandler, module: ModuleRecord) -> None:
+        super().__init__(data_handler, module.id)
+
+        self.home_id = module.home_id
+        self._attr_unique_id = module.id
+        self._attr_name = module.name
+        self._attr_device_info = get_module_device_info(module, data_handler.store)
+
+    @property
+    def module(self) -> ModuleRecord | None:
+        """
+        Return the module record, if still part of the topology.
+        """
+
+        return self.data_handler.store.modules.get(self.record_id)
+
+    @property
+    def available(self) -> bool:
+        """
+        Return whether the module can be reached.
+        """
+
+        module = self.module
+
+        return module is not None and module.reachable is not False
+
+
+@dataclass
+class IdiamantRequiredKeysMixin:
+    """
+    Mixin for the required keys of the descriptions of the record entities.
+    """
+
+    value_fn: Callable[[BridgeRecord | ModuleRecord], Any]
+
+
+class IdiamantRecordEntity(IdiamantEntity):
+    """
+    An iDiamant entity exposing a value of a bridge or module record.
+    Its state is only written when that value changes, not on every change of the record.
+    """
+
+    entity_description: EntityDescription
+
+    def __init__(
+        self,
+        data_handler: IDiamantDataHandler,
+        record: BridgeRecord | ModuleRecord,
+        description: EntityDescription,
+    ) -> None:
+        super().__init__(data_handler, record.id)
+
+        store = data_handler.store
+
+        self.entity_description = description
+        self._attr_unique_id = f"{record.id}-{description.key}"
+        self._attr_name = f"{record.name} {description.name}"
+
+        if record.id in store.bridges:
+            self._attr_device_info = get_bridge_device_info(record)
+        else:
+            self._attr_device_info = get_module_device_info(record, store)
+
+        # Entities are written once when added, with the value they were created with.
+        self._written_value = (self.available, self.value)
+
+    @property
+    def record(self) -> BridgeRecord | ModuleRecord | None:
+        """
+        Return the record, if still part of the topology.
+        """
+
+        store = self.data_handler.store
+
+        return store.modules.get(self.record_id) or store.bridges.get(self.record_id)
+
+    @property
+    def available(self) -> bool:
+        """
+        Return whether the record is still part of the topology.
+        """
+
+        return self.record is not None
+
+    @property
+    def value(self) -> Any:
+        """
+        Return the value exposed by the entity.
+        """
+
+        if (record := self.record) is None:
+            return None
+
+        return self.entity_description.value_fn(record)
+
+    @callback
+    def async_write_changed_state(self, record_ids: list[str]) -> None:
+        """
+        Write the state of the entity only if its value changed.
+        """
+
+        written_value = (self.available, self.value)
+        if written_value == self._written_value:
+            return
+
+        self._written_value = written_value
+        super().async_write_changed_state(record_ids)
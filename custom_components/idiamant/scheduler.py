@@ -0,0 +1,105 @@
+"""
+The iDiamant scheduler, shared by the data handlers of every config entry.
+"""
+
+from __future__ import annotations
+
+import logging
+from math import inf
+from time import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+if TYPE_CHECKING:
+    from .data_handler import IDiamantDataHandler
+
+_LOGGER = logging.getLogger(__name__)
+
+# Minimum time (in seconds) between the polls of two different data handlers.
+STAGGER_DELAY = 2
+
+
+class IDiamantScheduler:
+    """
+    Drive the polling of every data handler from a single timer.
+    Data handlers due at the same time are polled one after the other, `STAGGER_DELAY` seconds
+    apart, so that the accounts are not all polled on the same tick.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self._data_handlers: list[IDiamantDataHandler] = []
+        self._last_dispatch: float = 0
+        self._unsub_wake: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_register(self, data_handler: IDiamantDataHandler) -> None:
+        """
+        Start polling given data handler.
+        """
+
+        if data_handler not in self._data_handlers:
+            self._data_handlers.append(data_handler)
+
+        self.async_schedule()
+
+    @callback
+    def async_unregister(self, data_handler: IDiamantDataHandler) -> None:
+        """
+        Stop polling given data handler.
+        """
+
+        if data_handler in self._data_handlers:
+            self._data_handlers.remove(data_handler)
+
+        self.async_schedule()
+
+    @callback
+    def async_schedule(self) -> None:
+        """
+        (Re)schedule the timer for the next data handler due.
+        """
+
+        if self._unsub_wake:
+            self._unsub_wake()
+            self._unsub_wake = None
+
+        next_due = min(
+            (data_handler.next_due for data_handler in self._data_handlers),
+            default=inf,
+        )
+
+        if next_due == inf:
+            return
+
+        next_due = max(next_due, self._last_dispatch + STAGGER_DELAY)
+
+        self._unsub_wake = async_call_later(
+            self.hass, max(next_due - time(), 0), self._async_wake
+        )
+
+    @callback
+    def _async_wake(self, event_time: Any = None) -> None:
+        """
+        Poll the first data handler due, then schedule the next one.
+        """
+
+        self._unsub_wake = None
+        now = time()
+
+        for data_handler in self._data_handlers:
+            if data_handler.next_due > now:
+                continue
+
+            # Move the data handler at the end so that every account gets its turn.
+            self._data_handlers.remove(data_handler)
+            self._data_handlers.append(data_handler)
+            self._last_dispatch = now
+
+            data_handler.async_dispatch_update()
+
+            break
+
+        self.async_schedule()
@@ -0,0 +1,133 @@
+"""
+Sensor platform for iDiamant.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_HANDLER, DOMAIN
+from .data_handler import IDiamantDataHandler
+from .entity import (
+    IdiamantRecordEntity,
+    IdiamantRequiredKeysMixin,
+    async_subscribe_entities,
+)
+from .store import BridgeRecord, ModuleRecord
+
+
+@dataclass
+class IdiamantSensorEntityDescription(
+    SensorEntityDescription, IdiamantRequiredKeysMixin
+):
+    """
+    Describes an iDiamant sensor.
+    """
+
+
+def get_last_seen(record: BridgeRecord | ModuleRecord) -> Any:
+    """
+    Get the time a record was last seen by the Netatmo Connect API.
+    """
+
+    if not record.last_seen:
+        return None
+
+    return dt_util.utc_from_timestamp(record.last_seen)
+
+
+LAST_SEEN_SENSOR = IdiamantSensorEntityDescription(
+    key="last_seen",
+    name="Last seen",
+    device_class=SensorDeviceClass.TIMESTAMP,
+    entity_category=EntityCategory.DIAGNOSTIC,
+    value_fn=get_last_seen,
+)
+
+FIRMWARE_SENSOR = IdiamantSensorEntityDescription(
+    key="firmware_revision",
+    name="Firmware",
+    icon="mdi:chip",
+    entity_category=EntityCategory.DIAGNOSTIC,
+    value_fn=lambda record: record.firmware_revision,
+)
+
+BRIDGE_SENSORS: tuple[IdiamantSensorEntityDescription, ...] = (
+    IdiamantSensorEntityDescription(
+        key="wifi_strength",
+        name="Wi-Fi strength",
+        icon="mdi:wifi",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda bridge: bridge.wifi_strength,
+    ),
+    LAST_SEEN_SENSOR,
+    FIRMWARE_SENSOR,
+)
+
+MODULE_SENSORS: tuple[IdiamantSensorEntityDescription, ...] = (
+    IdiamantSensorEntityDescription(
+        key="rf_strength",
+        name="RF strength",
+        icon="mdi:signal",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda module: module.rf_strength,
+    ),
+    LAST_SEEN_SENSOR,
+    FIRMWARE_SENSOR,
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """
+    Set up the health sensors of every bridge and module of the topology, in a single pass.
+    """
+
+    data_handler: IDiamantDataHandler = hass.data[DOMAIN][entry.entry_id][DATA_HANDLER]
+    store = data_handler.store
+
+    entities = [
+        IdiamantSensor(data_handler, bridge, description)
+        for bridge in store.bridges.values()
+        for description in BRIDGE_SENSORS
+    ] + [
+        IdiamantSensor(data_handler, module, description)
+        for module in store.modules.values()
+        for description in MODULE_SENSORS
+    ]
+
+    async_add_entities(entities)
+
+    await async_subscribe_entities(hass, entry, data_handler, entities)
+
+
+class IdiamantSensor(IdiamantRecordEntity, SensorEntity):
+    """
+    A health sensor of an iDiamant bridge or module.
+    """
+
+    entity_description: IdiamantSensorEntityDescription
+
+    @property
+    def native_value(self) -> Any:
+        """
+        Return the value of the sensor.
+        """
+
+        return self.value
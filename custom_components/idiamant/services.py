@@ -0,0 +1,198 @@
+"""
+Services of the iDiamant integration.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import voluptuous as vol
+
+from homeassistant.const import Platform
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv, entity_registry as er
+
+from .const import (
+    ATTR_POSITIONS,
+    ATTR_TIMEOUT,
+    DATA_HANDLER,
+    DATA_ROOM_GROUPS,
+    DEFAULT_CONFIRMATION_TIMEOUT,
+    DOMAIN,
+    EVENT_POSITIONS_SET,
+    SERVICE_SET_POSITIONS,
+)
+from .data_handler import (
+    SHUTTER_DATA_CLASS_NAME,
+    IDiamantDataHandler,
+    get_shutter_data_class_entry,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STATUS_CONFIRMED = "confirmed"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+
+SET_POSITIONS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_POSITIONS): {
+            cv.entity_id: vol.All(vol.Coerce(int), vol.Range(min=0, max=100))
+        },
+        vol.Optional(ATTR_TIMEOUT, default=DEFAULT_CONFIRMATION_TIMEOUT): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=600)
+        ),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """
+    Register the services of the integration.
+    """
+
+    async def async_set_positions(call: ServiceCall) -> None:
+        await async_handle_set_positions(hass, call)
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_POSITIONS, async_set_positions, schema=SET_POSITIONS_SCHEMA
+    )
+
+
+async def async_handle_set_positions(hass: HomeAssistant, call: ServiceCall) -> None:
+    """
+    Move many covers at once, with a single command per home, then wait until every module
+    reached its target or the timeout expired.
+    The result of each module is reported in an `idiamant_positions_set` event.
+
+    Raises:
+        HomeAssistantError: When a cover is unknown or a command could not be sent.
+    """
+
+    # The cover platform is only imported once the service is used.
+    # pylint: disable-next=import-outside-toplevel
+    from .cover import get_cover_modules
+
+    entity_registry = er.async_get(hass)
+
+    # The target of each module, by home, for each data handler (config entry).
+    targets: dict[IDiamantDataHandler, dict[str, dict[str, int]]] = {}
+    entity_ids: dict[str, str] = {}
+
+    for entity_id, position in call.data[ATTR_POSITIONS].items():
+        entry = entity_registry.async_get(entity_id)
+        entry_data: dict = {}
+
+        if entry and entry.platform == DOMAIN and entry.domain == Platform.COVER:
+            entry_data = hass.data[DOMAIN].get(entry.config_entry_id, {})
+
+        if (data_handler := entry_data.get(DATA_HANDLER)) is None:
+            raise HomeAssistantError(f"{entity_id} is not an iDiamant cover")
+
+        for module in get_cover_modules(
+            data_handler.store, entry_data.get(DATA_ROOM_GROUPS, {}), entry.unique_id
+        ):
+            targets.setdefault(data_handler, {}).setdefault(module.home_id, {})[
+                module.id
+            ] = position
+            entity_ids[module.id] = entity_id
+
+    requested = {
+        module_id: (data_handler, target)
+        for data_handler, homes in targets.items()
+        for home_targets in homes.values()
+        for module_id, target in home_targets.items()
+    }
+    pending = dict(requested)
+    results = {module_id: STATUS_TIMEOUT for module_id in requested}
+    all_confirmed = asyncio.Event()
+
+    @callback
+    def async_check_positions() -> None:
+        for module_id, (data_handler, target) in list(pending.items()):
+            module = data_handler.store.modules.get(module_id)
+
+            if module is not None and module.current_position == target:
+                results[module_id] = STATUS_CONFIRMED
+                del pending[module_id]
+
+        if not pending:
+            all_confirmed.set()
+
+    commands = [
+        (data_handler, home_id, home_targets)
+        for data_handler, homes in targets.items()
+        for home_id, home_targets in homes.items()
+    ]
+
+    # Follow the status of the homes before sending the commands, not to miss any update.
+    for data_handler, home_id, _ in commands:
+        await data_handler.register_data_class(
+            SHUTTER_DATA_CLASS_NAME,
+            get_shutter_data_class_entry(home_id),
+            async_check_positions,
+        )
+
+    try:
+        errors = await asyncio.gather(
+            *(
+                data_handler.async_set_state(home_id, home_targets)
+                for data_handler, home_id, home_targets in commands
+            ),
+            return_exceptions=True,
+        )
+
+        for (_, home_id, home_targets), error in zip(commands, errors):
+            if isinstance(error, Exception):
+                _LOGGER.error(
+                    "Unable to set the positions in home %s: %s", home_id, error
+                )
+
+                for module_id in home_targets:
+                    results[module_id] = STATUS_FAILED
+                    pending.pop(module_id, None)
+
+        async_check_positions()
+
+        try:
+            await asyncio.wait_for(all_confirmed.wait(), call.data[ATTR_TIMEOUT])
+
+        except asyncio.TimeoutError:
+            _LOGGER.warning(
+                "Positions of %s not confirmed in time", ", ".join(sorted(pending))
+            )
+
+    finally:
+        for data_handler, home_id, _ in commands:
+            await data_handler.unregister_data_class(
+                get_shutter_data_class_entry(home_id), async_check_positions
+            )
+
+    hass.bus.async_fire(
+        EVENT_POSITIONS_SET,
+        {
+            "results": {
+                module_id: {
+                    "entity_id": entity_ids[module_id],
+                    "target": target,
+                    "position": (
+                        module.current_position
+                        if (module := data_handler.store.modules.get(module_id))
+                        else None
+                    ),
+                    "status": results[module_id],
+                }
+                for module_id, (data_handler, target) in requested.items()
+            }
+        },
+    )
+
+    if failed := [
+        module_id for module_id, status in results.items() if status == STATUS_FAILED
+    ]:
+        raise HomeAssistantError(
+            f"Unable to set the positions of {', '.join(sorted(failed))}"
+        )
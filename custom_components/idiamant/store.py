@@ -0,0 +1,421 @@
+"""
+The iDiamant normalized state store.
+
+Only the fields used by the entities are kept from the Netatmo Connect API responses, in compact
+records indexed by their id.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Collection
+from sys import intern
+from typing import Any
+
+from .const import GATEWAY_TYPES
+
+MODULE_STATUS_FIELDS = (
+    "reachable",
+    "current_position",
+    "target_position",
+    "rf_strength",
+    "last_seen",
+    "firmware_revision",
+)
+
+BRIDGE_STATUS_FIELDS = (
+    "reachable",
+    "wifi_strength",
+    "last_seen",
+    "firmware_revision",
+)
+
+
+class HomeRecord:
+    """
+    A home of the Netatmo account.
+    """
+
+    __slots__ = ("id", "name", "room_ids")
+
+    def __init__(self, home_id: str, name: str | None) -> None:
+        self.id = home_id
+        self.name = name
+        self.room_ids: tuple[str, ...] = ()
+
+
+class RoomRecord:
+    """
+    A room of a home.
+    """
+
+    __slots__ = ("id", "home_id", "name", "type")
+
+    def __init__(
+        self, room_id: str, home_id: str, name: str | None, room_type: str
+    ) -> None:
+        self.id = room_id
+        self.home_id = home_id
+        self.name = name
+        self.type = room_type
+
+
+class BridgeRecord:
+    """
+    An iDiamant gateway (NBG) bridging the shutters of a home.
+    """
+
+    __slots__ = ("id", "home_id", "type", "name", "version") + BRIDGE_STATUS_FIELDS
+
+    def __init__(
+        self, bridge_id: str, home_id: str, bridge_type: str, name: str
+    ) -> None:
+        self.id = bridge_id
+        self.home_id = home_id
+        self.type = bridge_type
+        self.name = name
+        self.version = 0
+
+        for field in BRIDGE_STATUS_FIELDS:
+            setattr(self, field, None)
+
+
+class ModuleRecord:
+    """
+    A shutter module of a home.
+    """
+
+    __slots__ = (
+        "id",
+        "home_id",
+        "room_id",
+        "bridge_id",
+        "type",
+        "name",
+        "version",
+    ) + MODULE_STATUS_FIELDS
+
+    def __init__(
+        self,
+        module_id: str,
+        home_id: str,
+        room_id: str | None,
+        bridge_id: str | None,
+        module_type: str,
+        name: str,
+    ) -> None:
+        self.id = module_id
+        self.home_id = home_id
+        self.room_id = room_id
+        self.bridge_id = bridge_id
+        self.type = module_type
+        self.name = name
+        self.version = 0
+
+        for field in MODULE_STATUS_FIELDS:
+            setattr(self, field, None)
+
+
+class IDiamantStore:
+    """
+    Keep the homes, rooms, bridges and modules of an account, with indexes to look them up in
+    constant time.
+    """
+
+    def __init__(self) -> None:
+        self.homes: dict[str, HomeRecord] = {}
+        self.rooms: dict[str, RoomRecord] = {}
+        self.bridges: dict[str, BridgeRecord] = {}
+        self.modules: dict[str, ModuleRecord] = {}
+        self.module_bridge: dict[str, str] = {}
+        self.room_modules: dict[str, set[str]] = {}
+        self.home_modules: dict[str, set[str]] = {}
+        self.home_bridges: dict[str, set[str]] = {}
+
+    def update_topology(self, home: dict[str, Any]) -> None:
+        """
+        Create or update the records of a home from its `homesdata` description.
+        Rooms and modules that are no longer part of the home are removed.
+
+        Args:
+            home (dict): A home of the `homesdata` response.
+        """
+
+        home_id = intern(home["id"])
+
+        home_record = self.homes.get(home_id)
+        if home_record is None:
+            home_record = self.homes[home_id] = HomeRecord(home_id, home.get("name"))
+        else:
+            home_record.name = home.get("name")
+
+        room_ids = []
+        for room in home.get("rooms", []):
+            room_id = intern(room["id"])
+            room_ids.append(room_id)
+
+            self.rooms[room_id] = RoomRecord(
+                room_id, home_id, room.get("name"), room.get("type", "custom")
+            )
+
+        for room_id in set(home_record.room_ids) - set(room_ids):
+            self.rooms.pop(room_id, None)
+            self.room_modules.pop(room_id, None)
+
+        home_record.room_ids = tuple(room_ids)
+
+        module_ids = set()
+        bridge_ids = set()
+        for module in home.get("modules", []):
+            module_id = intern(module["id"])
+
+            if module["type"] in GATEWAY_TYPES:
+                bridge_ids.add(module_id)
+                self._update_bridge(home_id, module_id, module)
+            else:
+                module_ids.add(module_id)
+                self._update_module(home_id, module_id, module)
+
+        for bridge_id in self.home_bridges.get(home_id, set()) - bridge_ids:
+            self.bridges.pop(bridge_id, None)
+
+        self.home_bridges[home_id] = bridge_ids
+
+        for module_id in self.home_modules.get(home_id, set()) - module_ids:
+            self._remove_module(module_id)
+
+    def _update_bridge(self, home_id: str, bridge_id: str, module: dict) -> None:
+        """
+        Create or update a bridge record.
+        """
+
+        bridge = self.bridges.get(bridge_id)
+        if bridge is None:
+            self.bridges[bridge_id] = BridgeRecord(
+                bridge_id, home_id, module["type"], module.get("name", bridge_id)
+            )
+        else:
+            if bridge.home_id != home_id:
+                self.home_bridges.get(bridge.home_id, set()).discard(bridge_id)
+                bridge.home_id = home_id
+
+            bridge.name = module.get("name", bridge_id)
+
+    def _update_module(self, home_id: str, module_id: str, module: dict) -> None:
+        """
+        Create or update a module record and its indexes.
+        """
+
+        room_id = module.get("room_id")
+        room_id = intern(room_id) if room_id else None
+        bridge_id = module.get("bridge")
+        bridge_id = intern(bridge_id) if bridge_id else None
+
+        record = self.modules.get(module_id)
+        if record is None:
+            record = self.modules[module_id] = ModuleRecord(
+                module_id,
+                home_id,
+                room_id,
+                bridge_id,
+                module["type"],
+                module.get("name", module_id),
+            )
+        else:
+            if record.room_id != room_id and record.room_id in self.room_modules:
+                self.room_modules[record.room_id].discard(module_id)
+
+            record.room_id = room_id
+            record.bridge_id = bridge_id
+            record.name = module.get("name", module_id)
+
+        self.home_modules.setdefault(home_id, set()).add(module_id)
+
+        if room_id:
+            self.room_modules.setdefault(room_id, set()).add(module_id)
+
+        if bridge_id:
+            self.module_bridge[module_id] = bridge_id
+        else:
+            self.module_bridge.pop(module_id, None)
+
+    def _remove_module(self, module_id: str) -> None:
+        """
+        Remove a module record and its indexes.
+        """
+
+        record = self.modules.pop(module_id, None)
+        if record is None:
+            return
+
+        self.module_bridge.pop(module_id, None)
+        self.home_modules.get(record.home_id, set()).discard(module_id)
+
+        if record.room_id in self.room_modules:
+            self.room_modules[record.room_id].discard(module_id)
+
+    def update_status(
+        self, home_status: dict[str, Any], module_types: Collection[str] | None = None
+    ) -> set[str]:
+        """
+        Update the records from a `homestatus` response.
+        Only the status fields used by the entities are read.
+
+        Args:
+            home_status (dict): The home of the `homestatus` response.
+            module_types (list, optional): The types of the modules to update, others are skipped
+                                           without being read.
+                                           Defaults to every type.
+
+        Returns:
+            set: The ids of the bridges and modules whose status changed.
+        """
+
+        changed = set()
+
+        for module in home_status.get("modules", []):
+            if module_types is not None and module.get("type") not in module_types:
+                continue
+
+            module_id = module["id"]
+
+            if record := self.modules.get(module_id):
+                fields = MODULE_STATUS_FIELDS
+            elif record := self.bridges.get(module_id):
+                fields = BRIDGE_STATUS_FIELDS
+            else:
+                continue
+
+            updated = False
+            for field in fields:
+                if field in module and getattr(record, field) != module[field]:
+                    setattr(record, field, module[field])
+                    updated = True
+
+            if updated:
+                record.version += 1
+                changed.add(record.id)
+
+        return changed
+
+    def remove_home(self, home_id: str) -> None:
+        """
+        Remove a home and everything it contains.
+        """
+
+        home = self.homes.pop(home_id, None)
+        if home is None:
+            return
+
+        for room_id in home.room_ids:
+            self.rooms.pop(room_id, None)
+            self.room_modules.pop(room_id, None)
+
+        for module_id in list(self.home_modules.pop(home_id, set())):
+            self._remove_module(module_id)
+
+        for bridge_id in self.home_bridges.pop(home_id, set()):
+            self.bridges.pop(bridge_id, None)
+
+    def get_topology_hash(self) -> int:
+        """
+        Get a hash of the topology of the homes, to tell whether it changed without keeping a
+        copy of it.
+        Only valid within the running process, as the hash of strings is salted.
+        """
+
+        return hash(
+            (
+                tuple(
+                    (home.id, home.name, home.room_ids) for home in self.homes.values()
+                ),
+                tuple(
+                    (room.id, room.home_id, room.name, room.type)
+                    for room in self.rooms.values()
+                ),
+                tuple(
+                    (bridge.id, bridge.home_id, bridge.type, bridge.name)
+                    for bridge in self.bridges.values()
+                ),
+                tuple(
+                    (
+                        module.id,
+                        module.home_id,
+                        module.room_id,
+                        module.bridge_id,
+                        module.type,
+                        module.name,
+                    )
+                    for module in self.modules.values()
+                ),
+            )
+        )
+
+    def export_topology(self) -> list[dict[str, Any]]:
+        """
+        Export the topology of the homes, in the format of the `homesdata` response.
+
+        Returns:
+            list: The homes, with their rooms and modules.
+        """
+
+        homes = {
+            home.id: {
+                "id": home.id,
+                "name": home.name,
+                "rooms": [
+                    {
+                        "id": room.id,
+                        "name": room.name,
+                        "type": room.type,
+                    }
+                    for room in (self.rooms[room_id] for room_id in home.room_ids)
+                ],
+                "modules": [],
+            }
+            for home in self.homes.values()
+        }
+
+        for bridge in self.bridges.values():
+            homes[bridge.home_id]["modules"].append(
+                {"id": bridge.id, "type": bridge.type, "name": bridge.name}
+            )
+
+        for module in self.modules.values():
+            homes[module.home_id]["modules"].append(
+                {
+                    "id": module.id,
+                    "type": module.type,
+                    "name": module.name,
+                    "room_id": module.room_id,
+                    "bridge": module.bridge_id,
+                }
+            )
+
+        return list(homes.values())
+
+    def get_bridge(self, module_id: str) -> BridgeRecord | None:
+        """
+        Return the bridge of given module, if any.
+        """
+
+        bridge_id = self.module_bridge.get(module_id)
+
+        return self.bridges.get(bridge_id) if bridge_id else None
+
+    def get_room_modules(self, room_id: str) -> list[ModuleRecord]:
+        """
+        Return the modules of given room.
+        """
+
+        return [
+            self.modules[module_id] for module_id in self.room_modules.get(room_id, ())
+        ]
+
+    def get_home_modules(self, home_id: str) -> list[ModuleRecord]:
+        """
+        Return the modules of given home.
+        """
+
+        return [
+            self.modules[module_id] for module_id in self.home_modules.get(home_id, ())
+        ]
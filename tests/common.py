@@ -0,0 +1,159 @@
+"""Common helpers for iDiamant tests."""
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from custom_components.idiamant.const import (
+    AUTH,
+)
+from custom_components.idiamant.const import (
+    DATA_HANDLER,
+)
+from custom_components.idiamant.const import (
+    DATA_SCHEDULER,
+)
+from custom_components.idiamant.const import (
+    DOMAIN,
+)
+from custom_components.idiamant.data_handler import (
+    DATA_CLASSES,
+)
+from custom_components.idiamant.data_handler import (
+    GATEWAY_DATA_CLASS_NAME,
+)
+from custom_components.idiamant.data_handler import (
+    IDiamantDataHandler,
+)
+from custom_components.idiamant.data_handler import (
+    SHUTTER_DATA_CLASS_NAME,
+)
+from custom_components.idiamant.scheduler import (
+    IDiamantScheduler,
+)
+
+HOMES = [
+    {
+        "id": f"home-{home}",
+        "name": f"Home {home}",
+        "rooms": [
+            {"id": f"room-{home}-1", "name": "Living room", "type": "livingroom"},
+            {"id": f"room-{home}-2", "name": "Bedroom", "type": "bedroom"},
+        ],
+        "modules": [
+            {"id": f"gateway-{home}", "type": "NBG", "name": "Gateway"},
+            {
+                "id": f"shutter-{home}-1",
+                "type": "NBR",
+                "name": "Window",
+                "room_id": f"room-{home}-1",
+                "bridge": f"gateway-{home}",
+            },
+            {
+                "id": f"shutter-{home}-2",
+                "type": "NBR",
+                "name": "Door",
+                "room_id": f"room-{home}-1",
+                "bridge": f"gateway-{home}",
+            },
+            {
+                "id": f"shutter-{home}-3",
+                "type": "NBO",
+                "name": "Bedroom window",
+                "room_id": f"room-{home}-2",
+                "bridge": f"gateway-{home}",
+            },
+        ],
+    }
+    for home in (1, 2)
+]
+
+
+def mock_auth():
+    """Build an authentication whose requests always succeed."""
+    auth = MagicMock()
+    auth.limiter.remaining = 500
+    auth.limiter.next_available = 0
+    auth.async_request = AsyncMock(return_value={"status": "ok"})
+    auth.async_get_access_token = AsyncMock()
+    auth.async_load_request_history = AsyncMock()
+    auth.async_close = AsyncMock()
+
+    return auth
+
+
+def mock_data_class(auth, store, **kwargs):
+    """Build a data class that never calls the API."""
+    data_class = MagicMock()
+    data_class.async_update = AsyncMock()
+    data_class.changed = False
+    data_class.changed_ids = set()
+
+    return data_class
+
+
+def mock_gateway_data_class(auth, store, home_ids):
+    """Build a gateway data class discovering the homes above."""
+    data_class = mock_data_class(auth, store)
+
+    async def async_update():
+        for home in HOMES:
+            if not home_ids or home["id"] in home_ids:
+                store.update_topology(home)
+
+    data_class.async_update.side_effect = async_update
+
+    return data_class
+
+
+async def setup_data_handler(hass, config_entry, auth=None):
+    """Set up a data handler whose data classes never call the API."""
+    auth = auth or mock_auth()
+    hass.data[DOMAIN] = {
+        DATA_SCHEDULER: IDiamantScheduler(hass),
+        config_entry.entry_id: {AUTH: auth},
+    }
+
+    with patch.dict(
+        DATA_CLASSES,
+        {
+            GATEWAY_DATA_CLASS_NAME: mock_gateway_data_class,
+            SHUTTER_DATA_CLASS_NAME: mock_data_class,
+        },
+    ):
+        data_handler = IDiamantDataHandler(hass, config_entry)
+        await data_handler.async_setup()
+
+    hass.data[DOMAIN][config_entry.entry_id][DATA_HANDLER] = data_handler
+
+    return data_handler
+
+
+async def setup_integration(
+    hass, config_entry, auth=None, shutter_data_class=mock_data_class
+):
+    """
+    Set up the integration and a config entry through Home Assistant, platforms included, with
+    data classes that never call the API, unless another shutter data class is given.
+    Return its data handler, or None when the entry could not be set up.
+    """
+    auth = auth or mock_auth()
+    config_entry.add_to_hass(hass)
+
+    with patch(
+        "custom_components.idiamant.config_entry_oauth2_flow."
+        "async_get_config_entry_implementation",
+        AsyncMock(return_value=MagicMock()),
+    ), patch(
+        "custom_components.idiamant.api.AsyncConfigEntryNetatmoAuth",
+        return_value=auth,
+    ), patch.dict(
+        DATA_CLASSES,
+        {
+            GATEWAY_DATA_CLASS_NAME: mock_gateway_data_class,
+            SHUTTER_DATA_CLASS_NAME: shutter_data_class,
+        },
+    ):
+        await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+
+    return hass.data[DOMAIN].get(config_entry.entry_id, {}).get(DATA_HANDLER)
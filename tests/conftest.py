@@ -6,6 +6,13 @@ import pytest
 pytest_plugins = "pytest_homeassistant_custom_component"
 
 
+# This fixture enables loading the integration from the custom_components directory.
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Enable custom integrations."""
+    yield
+
+
 # This fixture is used to prevent HomeAssistant from attempting to create and dismiss persistent
 # notifications. These calls would fail without this fixture since the persistent_notification
 # integration is never loaded during a test.
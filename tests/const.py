@@ -1,9 +1,25 @@
 """Constants for iDiamant tests."""
 from custom_components.idiamant.const import (
-    CONF_PASSWORD,
+    DOMAIN,
 )
 from custom_components.idiamant.const import (
+    SCOPES,
+)
+from homeassistant.const import (
+    CONF_PASSWORD,
+)
+from homeassistant.const import (
     CONF_USERNAME,
 )
 
 MOCK_CONFIG = {CONF_USERNAME: "test_username", CONF_PASSWORD: "test_password"}
+
+# The data of a config entry whose token is valid, once the authentication is mocked.
+MOCK_OAUTH_CONFIG = {
+    "auth_implementation": DOMAIN,
+    "token": {
+        "access_token": "access-token",
+        "expires_at": 4_102_444_800,
+        "scope": SCOPES,
+    },
+}
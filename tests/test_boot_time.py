@@ -0,0 +1,144 @@
+"""Test iDiamant does not slow Home Assistant boot down."""
+import json
+from pathlib import Path
+import subprocess
+import sys
+from time import perf_counter
+from time import time
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from custom_components.idiamant import (
+    async_setup,
+)
+from custom_components.idiamant import (
+    async_setup_entry,
+)
+from custom_components.idiamant import (
+    async_unload_entry,
+)
+from custom_components.idiamant.const import (
+    DOMAIN,
+)
+from custom_components.idiamant.const import (
+    SCOPES,
+)
+from custom_components.idiamant.data_handler import (
+    DATA_CLASSES,
+)
+from custom_components.idiamant.data_handler import (
+    GATEWAY_DATA_CLASS_NAME,
+)
+from custom_components.idiamant.data_handler import (
+    SHUTTER_DATA_CLASS_NAME,
+)
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .common import mock_auth
+from .common import mock_data_class
+from .common import mock_gateway_data_class
+
+# Time (in seconds) importing the integration may take, once Home Assistant itself is imported.
+IMPORT_BUDGET = 1
+# Time (in seconds) setting the integration, a config entry and its platforms up may take, API
+# calls excluded.
+SETUP_BUDGET = 0.5
+
+# Modules Home Assistant imports only when needed: the config flow, the diagnostics and the
+# platforms.
+LAZY_MODULES = [
+    "binary_sensor",
+    "config_flow",
+    "cover",
+    "diagnostics",
+    "sensor",
+]
+
+IMPORT_SCRIPT = """
+import json
+import sys
+from time import perf_counter
+
+# Imported by Home Assistant before any integration.
+import aiohttp
+import voluptuous
+import homeassistant.core
+import homeassistant.helpers.config_entry_oauth2_flow
+import homeassistant.helpers.config_validation
+
+start = perf_counter()
+import custom_components.idiamant
+
+print(
+    json.dumps(
+        {
+            "duration": perf_counter() - start,
+            "modules": sorted(
+                name for name in sys.modules if name.startswith("custom_components.")
+            ),
+        }
+    )
+)
+"""
+
+
+def test_cold_import():
+    """Test the integration imports within its budget, without its lazy modules."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        capture_output=True,
+        check=True,
+        cwd=Path(__file__).parent.parent,
+        text=True,
+    )
+    cold_import = json.loads(result.stdout)
+
+    for module in LAZY_MODULES:
+        assert f"custom_components.idiamant.{module}" not in cold_import["modules"]
+
+    assert cold_import["duration"] < IMPORT_BUDGET
+
+
+async def test_setup_time(hass):
+    """Test the integration, a config entry and its platforms are set up within their budget."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            "auth_implementation": DOMAIN,
+            "token": {
+                "access_token": "access-token",
+                "expires_at": time() + 3600,
+                "scope": SCOPES,
+            },
+        },
+        entry_id="test",
+    )
+    config_entry.add_to_hass(hass)
+
+    auth = mock_auth()
+
+    with patch(
+        "custom_components.idiamant.config_entry_oauth2_flow."
+        "async_get_config_entry_implementation",
+        AsyncMock(return_value=MagicMock()),
+    ), patch(
+        "custom_components.idiamant.api.AsyncConfigEntryNetatmoAuth",
+        return_value=auth,
+    ), patch.dict(
+        DATA_CLASSES,
+        {
+            GATEWAY_DATA_CLASS_NAME: mock_gateway_data_class,
+            SHUTTER_DATA_CLASS_NAME: mock_data_class,
+        },
+    ):
+        start = perf_counter()
+        assert await async_setup(hass, {})
+        assert await async_setup_entry(hass, config_entry)
+        # The platforms included
+        await hass.async_block_till_done()
+        duration = perf_counter() - start
+
+    assert duration < SETUP_BUDGET
+
+    assert await async_unload_entry(hass, config_entry)
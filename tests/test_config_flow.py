@@ -1,21 +1,41 @@
 """Test iDiamant config flow."""
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
 from unittest.mock import patch
 
 import pytest
+from custom_components.idiamant.config_flow import (
+    IDiamantFlowHandler,
+)
 from custom_components.idiamant.const import (
-    BINARY_SENSOR,
+    AUTH,
 )
 from custom_components.idiamant.const import (
-    DOMAIN,
+    CONF_HOMES,
+)
+from custom_components.idiamant.const import (
+    CONF_HOURLY_REQUEST_BUDGET,
+)
+from custom_components.idiamant.const import (
+    CONF_NIGHT_END,
+)
+from custom_components.idiamant.const import (
+    CONF_NIGHT_INTERVAL,
+)
+from custom_components.idiamant.const import (
+    CONF_NIGHT_START,
 )
 from custom_components.idiamant.const import (
-    PLATFORMS,
+    CONF_PRESENCE_ENTITY,
 )
 from custom_components.idiamant.const import (
-    SENSOR,
+    CONF_SHUTTER_INTERVAL,
 )
 from custom_components.idiamant.const import (
-    SWITCH,
+    DEFAULT_OPTIONS,
+)
+from custom_components.idiamant.const import (
+    DOMAIN,
 )
 from homeassistant import config_entries
 from homeassistant import data_entry_flow
@@ -99,19 +119,127 @@ async def test_options_flow(hass):
     await hass.config_entries.async_setup(entry.entry_id)
     result = await hass.config_entries.options.async_init(entry.entry_id)
 
-    # Verify that the first options step is a user form
+    # Verify that the first options step is a form prefilled with the defaults
     assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
-    assert result["step_id"] == "user"
+    assert result["step_id"] == "init"
 
-    # Enter some fake data into the form
+    # Tune some of the polling options
     result = await hass.config_entries.options.async_configure(
         result["flow_id"],
-        user_input={platform: platform != SENSOR for platform in PLATFORMS},
+        user_input={CONF_SHUTTER_INTERVAL: 120, CONF_HOURLY_REQUEST_BUDGET: 200},
     )
 
-    # Verify that the flow finishes
+    # The polling profiles come in a second step
+    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
+    assert result["step_id"] == "profiles"
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={
+            CONF_NIGHT_START: "22:00:00",
+            CONF_NIGHT_END: "07:00:00",
+            CONF_NIGHT_INTERVAL: 3600,
+        },
+    )
+
+    # Verify that the flow finishes, as the homes cannot be listed
     assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
-    assert result["title"] == "test_username"
 
-    # Verify that the options were updated
-    assert entry.options == {BINARY_SENSOR: True, SENSOR: False, SWITCH: True}
+    # Verify that the options were updated and the others kept their defaults
+    assert entry.options == {
+        **DEFAULT_OPTIONS,
+        CONF_SHUTTER_INTERVAL: 120,
+        CONF_HOURLY_REQUEST_BUDGET: 200,
+        CONF_NIGHT_START: "22:00:00",
+        CONF_NIGHT_END: "07:00:00",
+        CONF_NIGHT_INTERVAL: 3600,
+    }
+
+    # Clearing the night and the presence entity disables their profiles
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], user_input={}
+    )
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], user_input={}
+    )
+
+    assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+    assert entry.options[CONF_NIGHT_START] == ""
+    assert entry.options[CONF_NIGHT_END] == ""
+    assert entry.options[CONF_PRESENCE_ENTITY] == ""
+
+
+async def test_options_flow_homes(hass):
+    """Test choosing the homes to track in the options flow."""
+    entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+    entry.add_to_hass(hass)
+
+    auth = MagicMock()
+    auth.async_request = AsyncMock(
+        return_value={
+            "body": {
+                "homes": [
+                    {"id": "home-1", "name": "House"},
+                    {"id": "home-2", "name": "Flat"},
+                ]
+            }
+        }
+    )
+    hass.data[DOMAIN] = {entry.entry_id: {AUTH: auth}}
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], user_input={}
+    )
+    assert result["step_id"] == "profiles"
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], user_input={CONF_PRESENCE_ENTITY: "person.someone"}
+    )
+
+    # The homes of the account are listed in a last step
+    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
+    assert result["step_id"] == "homes"
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], user_input={CONF_HOMES: ["home-2"]}
+    )
+
+    assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+    assert entry.options[CONF_HOMES] == ["home-2"]
+    assert entry.options[CONF_PRESENCE_ENTITY] == "person.someone"
+    assert entry.options[CONF_NIGHT_START] == ""
+
+
+@pytest.mark.parametrize(
+    "unique_id,reason,expected_unique_id",
+    [
+        ("user", "reauth_successful", "user"),
+        # Entries created before they were bound to an account
+        (DOMAIN, "reauth_successful", "user"),
+        ("other-user", "wrong_account", "other-user"),
+    ],
+)
+async def test_reauth_account(hass, unique_id, reason, expected_unique_id):
+    """Test reauth only updates the entry with a token of its Netatmo account."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG, entry_id="test", unique_id=unique_id
+    )
+    config_entry.add_to_hass(hass)
+    data = {**MOCK_CONFIG, "token": {"access_token": "new-access-token"}}
+
+    flow = IDiamantFlowHandler()
+    flow.hass = hass
+    flow.context = {"source": config_entries.SOURCE_REAUTH, "entry_id": "test"}
+    flow._async_get_user = AsyncMock(return_value={"id": "user"})
+
+    await flow.async_step_reauth(MOCK_CONFIG)
+
+    with patch.object(hass.config_entries, "async_reload", AsyncMock()):
+        result = await flow.async_oauth_create_entry(data)
+
+    assert result["type"] == data_entry_flow.RESULT_TYPE_ABORT
+    assert result["reason"] == reason
+    assert config_entry.unique_id == expected_unique_id
+    assert (config_entry.data == data) == (reason == "reauth_successful")
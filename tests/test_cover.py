@@ -0,0 +1,195 @@
+"""Test iDiamant cover."""
+from custom_components.idiamant.const import (
+    DOMAIN,
+)
+from custom_components.idiamant.const import (
+    HOMESTATUS_PATH,
+)
+from custom_components.idiamant.const import (
+    SETSTATE_PATH,
+)
+from custom_components.idiamant.data_classes import (
+    AsyncShutterData,
+)
+from custom_components.idiamant.data_handler import (
+    get_shutter_data_class_entry,
+)
+from homeassistant.components.cover import ATTR_CURRENT_POSITION
+from homeassistant.components.cover import DOMAIN as COVER
+from homeassistant.components.cover import SERVICE_CLOSE_COVER
+from homeassistant.components.cover import SERVICE_OPEN_COVER
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.const import STATE_CLOSED
+from homeassistant.const import STATE_OPEN
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from .common import mock_auth
+from .common import setup_integration
+from .const import MOCK_OAUTH_CONFIG
+
+
+async def test_cover_per_module(hass):
+    """Test one cover and one device per module, linked to their gateway."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="test"
+    )
+    data_handler = await setup_integration(hass, config_entry)
+
+    entity_registry = er.async_get(hass)
+    device_registry = dr.async_get(hass)
+
+    entity_id = entity_registry.async_get_entity_id(COVER, DOMAIN, "shutter-1-1")
+    assert entity_id
+    # 6 modules, 4 rooms and 2 homes
+    assert len(hass.states.async_entity_ids(COVER)) == 12
+
+    device = device_registry.async_get_device({(DOMAIN, "shutter-1-1")})
+    gateway = device_registry.async_get_device({(DOMAIN, "gateway-1")})
+    assert device.via_device_id == gateway.id
+    assert device.model == "Rolling shutter"
+    assert gateway.model == "Gateway"
+
+    # A new status only writes the entities of the modules that changed
+    data_class_entry = get_shutter_data_class_entry("home-1")
+    data_class = data_handler.data[data_class_entry]
+
+    async def async_update():
+        data_class.changed_ids = data_handler.store.update_status(
+            {"id": "home-1", "modules": [{"id": "shutter-1-1", "current_position": 0}]}
+        )
+
+    data_class.async_update.side_effect = async_update
+    await data_handler.async_fetch_data(data_class_entry)
+    assert hass.states.get(entity_id).state == STATE_CLOSED
+
+    # Commands are sent through setstate, with the bridge of the module
+    auth = data_handler._auth
+    await hass.services.async_call(
+        COVER, SERVICE_OPEN_COVER, {ATTR_ENTITY_ID: entity_id}, blocking=True
+    )
+
+    assert auth.async_request.call_args.args == ("POST", SETSTATE_PATH)
+    assert auth.async_request.call_args.kwargs["body"] == {
+        "home": {
+            "id": "home-1",
+            "modules": [
+                {"id": "shutter-1-1", "target_position": 100, "bridge": "gateway-1"}
+            ],
+        }
+    }
+
+    data_class.async_update.side_effect = None
+    data_class.changed_ids = set()
+    data_handler.store.update_status(
+        {"id": "home-1", "modules": [{"id": "shutter-1-1", "current_position": 100}]}
+    )
+    assert hass.states.get(entity_id).state == STATE_CLOSED
+
+    data_class.changed_ids = {"shutter-1-1"}
+    await data_handler.async_fetch_data(data_class_entry)
+    assert hass.states.get(entity_id).state == STATE_OPEN
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_group_cover(hass):
+    """Test room and home covers send a single command and aggregate their members."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="test"
+    )
+    data_handler = await setup_integration(hass, config_entry)
+
+    entity_registry = er.async_get(hass)
+    room_entity_id = entity_registry.async_get_entity_id(
+        COVER, DOMAIN, "home-1-room-1-1"
+    )
+    home_entity_id = entity_registry.async_get_entity_id(COVER, DOMAIN, "home-1")
+    assert room_entity_id
+    assert home_entity_id
+
+    auth = data_handler._auth
+    auth.async_request.reset_mock()
+    await hass.services.async_call(
+        COVER, SERVICE_CLOSE_COVER, {ATTR_ENTITY_ID: home_entity_id}, blocking=True
+    )
+
+    assert auth.async_request.call_count == 1
+    assert auth.async_request.call_args.kwargs["body"] == {
+        "home": {
+            "id": "home-1",
+            "modules": [
+                {"id": module_id, "target_position": 0, "bridge": "gateway-1"}
+                for module_id in ("shutter-1-1", "shutter-1-2", "shutter-1-3")
+            ],
+        }
+    }
+
+    data_class_entry = get_shutter_data_class_entry("home-1")
+    data_class = data_handler.data[data_class_entry]
+
+    position = 0
+
+    async def async_update():
+        data_class.changed_ids = data_handler.store.update_status(
+            {
+                "id": "home-1",
+                "modules": [
+                    {"id": "shutter-1-1", "current_position": position},
+                    {"id": "shutter-1-2", "current_position": position},
+                ],
+            }
+        )
+
+    data_class.async_update.side_effect = async_update
+    await data_handler.async_fetch_data(data_class_entry)
+    assert hass.states.get(room_entity_id).state == STATE_CLOSED
+
+    position = 100
+    await data_handler.async_fetch_data(data_class_entry)
+    state = hass.states.get(room_entity_id)
+    assert state.state == STATE_OPEN
+    assert state.attributes[ATTR_CURRENT_POSITION] == 100
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_polled_status(hass):
+    """Test a poll changing the status of shutters writes their covers and their groups."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="test"
+    )
+    auth = mock_auth()
+    data_handler = await setup_integration(
+        hass, config_entry, auth, shutter_data_class=AsyncShutterData
+    )
+
+    entity_registry = er.async_get(hass)
+    window = entity_registry.async_get_entity_id(COVER, DOMAIN, "shutter-1-1")
+    living_room = entity_registry.async_get_entity_id(COVER, DOMAIN, "home-1-room-1-1")
+
+    auth.async_request.return_value = {
+        "body": {
+            "home": {
+                "id": "home-1",
+                "modules": [
+                    {"id": "shutter-1-1", "type": "NBR", "current_position": 0},
+                    {"id": "shutter-1-2", "type": "NBR", "current_position": 0},
+                ],
+            }
+        }
+    }
+
+    # Polled by the scheduler, as Home Assistant would
+    data_handler.async_force_update(get_shutter_data_class_entry("home-1"))
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await hass.async_block_till_done()
+
+    assert auth.async_request.call_args.args == ("GET", HOMESTATUS_PATH)
+    assert hass.states.get(window).state == STATE_CLOSED
+    assert hass.states.get(living_room).state == STATE_CLOSED
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
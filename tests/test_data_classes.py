@@ -0,0 +1,143 @@
+"""Test iDiamant data classes."""
+from copy import deepcopy
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+from custom_components.idiamant.api import (
+    ApiError,
+)
+from custom_components.idiamant.const import (
+    HOMESDATA_PATH,
+)
+from custom_components.idiamant.const import (
+    HOMESTATUS_PATH,
+)
+from custom_components.idiamant.data_classes import (
+    AsyncGatewayData,
+)
+from custom_components.idiamant.data_classes import (
+    AsyncShutterData,
+)
+from custom_components.idiamant.store import (
+    IDiamantStore,
+)
+
+HOMES_DATA = {
+    "body": {
+        "homes": [
+            {
+                "id": "home-1",
+                "name": "Home",
+                "rooms": [{"id": "room-1", "name": "Living room"}],
+                "modules": [
+                    {"id": "gateway-1", "type": "NBG", "name": "Gateway"},
+                    {"id": "shutter-1", "type": "NBR", "bridge": "gateway-1"},
+                ],
+            }
+        ]
+    }
+}
+
+HOME_STATUS = {
+    "body": {
+        "home": {
+            "id": "home-1",
+            "modules": [
+                {
+                    "id": "gateway-1",
+                    "type": "NBG",
+                    "firmware_revision": 36,
+                    "wifi_strength": 60,
+                },
+                {
+                    "id": "shutter-1",
+                    "type": "NBR",
+                    "bridge": "gateway-1",
+                    "current_position": 0,
+                },
+            ],
+        }
+    }
+}
+
+
+def mock_auth(home_status):
+    """Build an authentication answering with the fixtures above."""
+    auth = MagicMock()
+    auth.async_request = AsyncMock(
+        side_effect=lambda method, path, **kwargs: (
+            HOMES_DATA if path == HOMESDATA_PATH else home_status
+        )
+    )
+
+    return auth
+
+
+async def test_gateway_then_shutter_data():
+    """Test the shutters are polled from the topology of the gateway data class."""
+    home_status = deepcopy(HOME_STATUS)
+    auth = mock_auth(home_status)
+    store = IDiamantStore()
+
+    gateway_data = AsyncGatewayData(auth, store)
+    await gateway_data.async_update()
+
+    assert list(store.homes) == ["home-1"]
+    assert list(store.bridges) == ["gateway-1"]
+    assert store.bridges["gateway-1"].firmware_revision == 36
+    # The gateway data class leaves the shutters to the shutter data classes
+    assert store.modules["shutter-1"].current_position is None
+
+    auth.async_request.reset_mock()
+
+    shutter_data = AsyncShutterData(auth, store, "home-1")
+    await shutter_data.async_update()
+
+    # Only the status of the shutters is fetched by the fast polling
+    assert [call.args[1] for call in auth.async_request.call_args_list] == [
+        HOMESTATUS_PATH
+    ]
+    assert auth.async_request.call_args.kwargs["params"] == {
+        "home_id": "home-1",
+        "device_types": "NBR,NBO,NBS",
+    }
+    assert shutter_data.changed_ids == {"shutter-1"}
+    assert store.modules["shutter-1"].current_position == 0
+
+    await shutter_data.async_update()
+    assert not shutter_data.changed
+
+    home_status["body"]["home"]["modules"][1]["current_position"] = 100
+    await shutter_data.async_update()
+    assert shutter_data.changed_ids == {"shutter-1"}
+
+    await shutter_data.async_update()
+    assert not shutter_data.changed
+
+
+async def test_failed_update():
+    """Test a failed update reports no change, so that no entity writes its state again."""
+    home_status = deepcopy(HOME_STATUS)
+    auth = mock_auth(home_status)
+    store = IDiamantStore()
+
+    gateway_data = AsyncGatewayData(auth, store)
+    await gateway_data.async_update()
+    assert gateway_data.changed_ids == {"gateway-1"}
+
+    shutter_data = AsyncShutterData(auth, store, "home-1")
+    await shutter_data.async_update()
+    assert shutter_data.changed_ids == {"shutter-1"}
+
+    auth.async_request.side_effect = None
+    auth.async_request.return_value = None
+
+    with pytest.raises(ApiError):
+        await gateway_data.async_update()
+
+    with pytest.raises(ApiError):
+        await shutter_data.async_update()
+
+    assert not gateway_data.changed_ids
+    assert not shutter_data.changed
@@ -0,0 +1,366 @@
+"""Test iDiamant data handler."""
+import asyncio
+import gc
+from time import time
+from unittest.mock import patch
+import weakref
+
+import pytest
+
+from custom_components.idiamant.api import (
+    ApiError,
+)
+from custom_components.idiamant.const import (
+    CONF_HOMES,
+)
+from custom_components.idiamant.const import (
+    CONF_HOURLY_REQUEST_BUDGET,
+)
+from custom_components.idiamant.const import (
+    CONF_MAX_CONCURRENT_REQUESTS,
+)
+from custom_components.idiamant.const import (
+    CONF_REQUEST_TIMEOUT,
+)
+from custom_components.idiamant.const import (
+    CONF_NIGHT_END,
+)
+from custom_components.idiamant.const import (
+    CONF_NIGHT_START,
+)
+from custom_components.idiamant.const import (
+    CONF_PRESENCE_ENTITY,
+)
+from custom_components.idiamant.const import (
+    CONF_SHUTTER_INTERVAL,
+)
+from custom_components.idiamant.const import (
+    DATA_SCHEDULER,
+)
+from custom_components.idiamant.const import (
+    DOMAIN,
+)
+from custom_components.idiamant.const import (
+    PROFILE_ACTIVE,
+)
+from custom_components.idiamant.const import (
+    PROFILE_AWAY,
+)
+from custom_components.idiamant.const import (
+    PROFILE_NIGHT,
+)
+from custom_components.idiamant.data_handler import (
+    GATEWAY_DATA_CLASS_NAME,
+)
+from custom_components.idiamant.data_handler import (
+    STARTUP_WINDOW,
+)
+from custom_components.idiamant.data_handler import (
+    get_phase,
+)
+from custom_components.idiamant.data_handler import (
+    get_shutter_data_class_entry,
+)
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from .common import HOMES
+from .common import mock_auth
+from .common import setup_data_handler
+from .const import MOCK_CONFIG
+
+
+async def test_apply_options(hass):
+    """Test options are applied to a running data handler."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+    auth = mock_auth()
+    data_handler = await setup_data_handler(hass, config_entry, auth)
+
+    data_class = data_handler.data_classes[get_shutter_data_class_entry("home-1")]
+    assert data_class.interval == 60
+    assert data_handler.data_classes[GATEWAY_DATA_CLASS_NAME].interval == 600
+
+    data_handler.async_apply_options(
+        {
+            CONF_SHUTTER_INTERVAL: 30,
+            CONF_MAX_CONCURRENT_REQUESTS: 4,
+            CONF_REQUEST_TIMEOUT: 5,
+            CONF_HOURLY_REQUEST_BUDGET: 100,
+        }
+    )
+
+    # Intervals and request limits are updated without reloading the entry
+    assert data_class.interval == 30
+    assert auth.configure.call_args.kwargs == {
+        "max_concurrent": 4,
+        "timeout": 5,
+        "hourly_budget": 100,
+        "hedge_requests": False,
+    }
+
+    # Commands switch the data class to the active interval
+    data_handler.async_set_active(get_shutter_data_class_entry("home-1"))
+    assert data_class.interval == 5
+
+
+async def test_chosen_homes(hass):
+    """Test only the chosen homes get a shutter data class."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG,
+        options={CONF_HOMES: ["home-2"]},
+        entry_id="test",
+    )
+    data_handler = await setup_data_handler(hass, config_entry)
+
+    assert list(data_handler.store.homes) == ["home-2"]
+    assert set(data_handler.data_classes) == {
+        GATEWAY_DATA_CLASS_NAME,
+        get_shutter_data_class_entry("home-2"),
+    }
+
+
+async def test_topology_from_cache(hass, hass_storage):
+    """Test the cached topology is used at setup and nothing is fetched inline."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+    hass_storage[f"{DOMAIN}.test.topology"] = {
+        "version": 1,
+        "key": f"{DOMAIN}.test.topology",
+        "data": [{"id": "home-3", "name": "Cached home"}],
+    }
+    data_handler = await setup_data_handler(hass, config_entry)
+
+    assert list(data_handler.store.homes) == ["home-3"]
+    assert not data_handler.data[GATEWAY_DATA_CLASS_NAME].async_update.called
+    assert not data_handler.data[
+        get_shutter_data_class_entry("home-3")
+    ].async_update.called
+
+    # Every data class is due within the startup window, for the scheduler to poll them
+    assert data_handler.next_due <= time() + STARTUP_WINDOW
+
+
+async def test_topology_cache_and_chosen_homes(hass, hass_storage):
+    """Test the cached topology follows a change of the chosen homes."""
+    hass_storage[f"{DOMAIN}.test.topology"] = {
+        "version": 1,
+        "key": f"{DOMAIN}.test.topology",
+        "data": HOMES,
+    }
+
+    # A home no longer chosen is left out of the cached topology
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG,
+        options={CONF_HOMES: ["home-2"]},
+        entry_id="test",
+    )
+    data_handler = await setup_data_handler(hass, config_entry)
+
+    assert list(data_handler.store.homes) == ["home-2"]
+    assert "shutter-1-1" not in data_handler.store.modules
+    assert set(data_handler.data_classes) == {
+        GATEWAY_DATA_CLASS_NAME,
+        get_shutter_data_class_entry("home-2"),
+    }
+    assert not data_handler.data[GATEWAY_DATA_CLASS_NAME].async_update.called
+    await data_handler.async_shutdown()
+
+    # A home newly chosen is missing from the cache, so the topology is fetched
+    hass_storage[f"{DOMAIN}.test.topology"]["data"] = HOMES[:1]
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG,
+        options={CONF_HOMES: ["home-1", "home-2"]},
+        entry_id="test",
+    )
+    data_handler = await setup_data_handler(hass, config_entry)
+
+    assert data_handler.data[GATEWAY_DATA_CLASS_NAME].async_update.called
+    assert sorted(data_handler.store.homes) == ["home-1", "home-2"]
+    assert get_shutter_data_class_entry("home-2") in data_handler.data_classes
+    await data_handler.async_shutdown()
+
+
+async def start_hanging_data_handler(hass, config_entry):
+    """Set up and start a data handler whose shutter polls never complete."""
+    data_handler = await setup_data_handler(hass, config_entry)
+
+    for home_id in data_handler.store.homes:
+        data_class_entry = get_shutter_data_class_entry(home_id)
+        data_handler.data[data_class_entry].async_update.side_effect = (
+            asyncio.Event().wait
+        )
+        data_handler.async_force_update(data_class_entry)
+
+    data_handler.async_start()
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await asyncio.sleep(0)
+
+    return data_handler
+
+
+async def test_shutdown(hass):
+    """Test the polls and commands in flight are cancelled on shutdown."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+    data_handler = await start_hanging_data_handler(hass, config_entry)
+    scheduler = hass.data[DOMAIN][DATA_SCHEDULER]
+
+    data_handler._auth.async_request.side_effect = asyncio.Event().wait
+    command = hass.async_create_task(
+        data_handler.async_set_state("home-1", {"shutter-1-1": 100})
+    )
+    await asyncio.sleep(0)
+
+    tasks = set(data_handler._tasks)
+    assert len(tasks) == 2
+
+    await data_handler.async_shutdown()
+
+    assert all(task.cancelled() for task in tasks)
+    assert not data_handler._tasks
+    assert scheduler._unsub_wake is None
+
+    # The pending command fails instead of hanging
+    with pytest.raises(ApiError):
+        await command
+
+
+async def test_reload_stress(hass):
+    """Test data handlers set up and shut down repeatedly leave no timer, task nor reference."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+
+    def count_timers():
+        return sum(not handle.cancelled() for handle in hass.loop._scheduled)
+
+    async def reload():
+        data_handler = await start_hanging_data_handler(hass, config_entry)
+        await data_handler.async_shutdown()
+        hass.data[DOMAIN].pop(config_entry.entry_id)
+        await hass.async_block_till_done()
+
+        return weakref.ref(data_handler)
+
+    # Warm up the caches of Home Assistant
+    for _ in range(3):
+        await reload()
+
+    gc.collect()
+    timers = count_timers()
+    tasks = len(asyncio.all_tasks())
+
+    data_handlers = [await reload() for _ in range(50)]
+
+    gc.collect()
+
+    assert count_timers() == timers
+    assert len(asyncio.all_tasks()) == tasks
+    # Nothing keeps the data handlers alive once shut down
+    assert all(data_handler() is None for data_handler in data_handlers)
+
+
+async def test_phases_and_recovery(hass):
+    """Test the homes poll at their own phase, and come back gradually after failures."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+    data_handler = await setup_data_handler(hass, config_entry)
+
+    entries = [
+        get_shutter_data_class_entry(home_id) for home_id in ("home-1", "home-2")
+    ]
+    assert get_phase(entries[0]) != get_phase(entries[1])
+
+    # Each home is due at its own phase of the startup window
+    now = time()
+    for data_class_entry in entries:
+        data_class = data_handler.data_classes[data_class_entry]
+        assert data_class.next_scan == pytest.approx(
+            now + get_phase(data_class_entry) * STARTUP_WINDOW, abs=1
+        )
+
+    data_class_entry = entries[0]
+    data_class = data_handler.data_classes[data_class_entry]
+    data_handler.data[data_class_entry].async_update.side_effect = ApiError
+
+    for _ in range(10):
+        await data_handler.async_fetch_data(data_class_entry)
+
+    # The failing home backs off, up to a cap
+    assert data_class.failures == 4
+    assert data_handler._get_interval(data_class) == 60 * 16
+
+    data_handler.data[data_class_entry].async_update.side_effect = None
+    await data_handler.async_fetch_data(data_class_entry)
+
+    # It then comes back gradually
+    assert data_handler._get_interval(data_class) == 60 * 8
+
+    # Scans stay aligned on the phase of the home, give or take the jitter
+    data_class.failures = 0
+    data_class.interval = 60
+    next_scan = data_handler._get_next_scan(data_class)
+    assert 30 - 3 <= next_scan - time() <= 90 + 3
+    offset = (next_scan - get_phase(data_class_entry) * 60) % 60
+    assert min(offset, 60 - offset) <= 3
+
+
+async def test_polling_profiles(hass):
+    """Test polling slows down at night and while nobody is home, but not after a command."""
+    hass.states.async_set("person.someone", "home")
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG,
+        options={
+            CONF_NIGHT_START: "22:00:00",
+            CONF_NIGHT_END: "07:00:00",
+            CONF_PRESENCE_ENTITY: "person.someone",
+        },
+        entry_id="test",
+    )
+    noon = dt_util.now().replace(hour=12, minute=0)
+    with patch(
+        "custom_components.idiamant.data_handler.dt_util.now", return_value=noon
+    ):
+        data_handler = await setup_data_handler(hass, config_entry)
+
+    data_class_entry = get_shutter_data_class_entry("home-1")
+    data_class = data_handler.data_classes[data_class_entry]
+    assert data_handler.profile == PROFILE_ACTIVE
+    assert data_class.interval == 60
+
+    # The night spans midnight
+    with patch(
+        "custom_components.idiamant.data_handler.dt_util.now",
+        return_value=noon.replace(hour=2),
+    ):
+        data_handler._async_update_profile()
+
+    assert data_handler.profile == PROFILE_NIGHT
+    assert data_class.interval == 1800
+    assert data_handler.data_classes[GATEWAY_DATA_CLASS_NAME].interval == 1800
+
+    # Commands are still followed closely
+    data_handler.async_set_active(data_class_entry)
+    assert data_class.interval == 5
+
+    # The presence entity selects the away profile, and back
+    with patch(
+        "custom_components.idiamant.data_handler.dt_util.now", return_value=noon
+    ):
+        hass.states.async_set("person.someone", "not_home")
+        await hass.async_block_till_done()
+        assert data_handler.profile == PROFILE_AWAY
+
+        hass.states.async_set("person.someone", "home")
+        await hass.async_block_till_done()
+        assert data_handler.profile == PROFILE_ACTIVE
+
+    data_class.active_until = 0
+    data_handler._async_reschedule()
+    assert data_class.interval == 60
+
+    # Nothing follows the presence entity once the data handler shut down
+    await data_handler.async_shutdown()
+    hass.states.async_set("person.someone", "not_home")
+    await hass.async_block_till_done()
+    assert data_handler.profile == PROFILE_ACTIVE
@@ -0,0 +1,44 @@
+"""Test iDiamant diagnostics."""
+from unittest.mock import MagicMock
+
+from custom_components.idiamant.api import (
+    AsyncConfigEntryNetatmoAuth,
+)
+from custom_components.idiamant.api import (
+    async_create_dedicated_session,
+)
+from custom_components.idiamant.const import (
+    AUTH,
+)
+from custom_components.idiamant.const import (
+    DOMAIN,
+)
+from custom_components.idiamant.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .const import MOCK_CONFIG
+
+
+async def test_dedicated_session_diagnostics(hass):
+    """Test the connection reuse of a dedicated session is reported."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+    config_entry.add_to_hass(hass)
+
+    websession, connection_stats = await async_create_dedicated_session(hass, 3)
+    assert websession.connector.limit == 3
+
+    auth = AsyncConfigEntryNetatmoAuth(websession, MagicMock(), connection_stats)
+    hass.data[DOMAIN] = {config_entry.entry_id: {AUTH: auth}}
+
+    connection_stats.connections_created = 1
+    connection_stats.connections_reused = 3
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert diagnostics["connections"]["reuse_ratio"] == 0.75
+    assert diagnostics["requests"]["used"] == 0
+
+    # The dedicated session belongs to the authentication
+    await auth.async_close()
+    assert websession.closed
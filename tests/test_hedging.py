@@ -0,0 +1,82 @@
+"""Test iDiamant hedged requests."""
+import asyncio
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from custom_components.idiamant.api import (
+    AsyncConfigEntryNetatmoAuth,
+)
+from custom_components.idiamant.const import (
+    HOMESTATUS_PATH,
+)
+
+
+def mock_response(data):
+    """Build a successful response."""
+    response = MagicMock()
+    response.ok = True
+    response.json = AsyncMock(return_value=data)
+
+    return response
+
+
+def mock_auth(websession):
+    """Build an authentication with a valid token, hedging its read requests."""
+    oauth_session = MagicMock()
+    oauth_session.valid_token = True
+    oauth_session.token = {"access_token": "token"}
+
+    auth = AsyncConfigEntryNetatmoAuth(websession, oauth_session)
+    auth.configure(max_concurrent=2, timeout=10, hourly_budget=500, hedge_requests=True)
+
+    return auth
+
+
+async def test_hedged_request(hass):
+    """Test a read request slower than usual is hedged, and the first answer used."""
+    websession = MagicMock()
+    auth = mock_auth(websession)
+
+    # Nothing is hedged until the latency of the endpoint is known
+    assert auth.hedger.get_delay(HOMESTATUS_PATH, 10) is None
+
+    for _ in range(40):
+        auth.hedger.record_latency(HOMESTATUS_PATH, 0.01)
+
+    for _ in range(10):
+        auth.limiter.record()
+
+    assert auth.hedger.get_delay(HOMESTATUS_PATH, 10) == 0.5
+
+    slow_request = asyncio.Event()
+
+    async def get(url, **kwargs):
+        if websession.get.call_count == 1:
+            await slow_request.wait()
+
+        return mock_response({"call": websession.get.call_count})
+
+    websession.get = AsyncMock(side_effect=get)
+
+    assert await auth.async_request("GET", HOMESTATUS_PATH) == {"call": 2}
+    assert auth.hedger.hedges == 1
+
+    # The cancelled slow request is recorded as well, for the time it had taken
+    assert max(auth.hedger._latencies[HOMESTATUS_PATH]) >= 0.5
+
+    # The budget of hedged requests is spent: 5% of the requests of the hour
+    websession.get.reset_mock()
+    assert not auth.hedger.can_hedge(auth.limiter)
+
+    slow_request.set()
+    # The hedge delay is capped by the timeout of the request
+    with patch.object(
+        auth.hedger, "get_delay", wraps=auth.hedger.get_delay
+    ) as get_delay:
+        assert await auth.async_request("GET", HOMESTATUS_PATH, timeout=5) == {
+            "call": 1
+        }
+
+    get_delay.assert_called_once_with(HOMESTATUS_PATH, 5)
+    assert websession.get.call_count == 1
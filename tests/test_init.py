@@ -1,63 +1,96 @@
 """Test iDiamant setup process."""
-import pytest
-from custom_components.idiamant import (
-    async_reload_entry,
-)
-from custom_components.idiamant import (
-    async_setup_entry,
-)
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
 from custom_components.idiamant import (
-    async_unload_entry,
+    async_migrate_unique_id,
 )
-from custom_components.idiamant import (
-    IdiamantDataUpdateCoordinator,
+from custom_components.idiamant.api import (
+    ApiError,
 )
 from custom_components.idiamant.const import (
     DOMAIN,
 )
-from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.config_entries import ConfigEntryState
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
-from .const import MOCK_CONFIG
+from .common import mock_auth
+from .common import setup_integration
+from .const import MOCK_OAUTH_CONFIG
 
 
-# We can pass fixtures as defined in conftest.py to tell pytest to use the fixture
-# for a given test. We can also leverage fixtures and mocks that are available in
-# Home Assistant using the pytest_homeassistant_custom_component plugin.
-# Assertions allow you to verify that the return value of whatever is on the left
-# side of the assertion matches with the right side.
-async def test_setup_unload_and_reload_entry(hass, bypass_get_data):
+async def test_setup_and_unload_entry(hass):
     """Test entry setup and unload."""
-    # Create a mock entry so we don't have to go through config flow
-    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
-
-    # Set up the entry and assert that the values set during setup are where we expect
-    # them to be. Because we have patched the IdiamantDataUpdateCoordinator.async_get_data
-    # call, no code from custom_components/idiamant/api.py actually runs.
-    assert await async_setup_entry(hass, config_entry)
-    assert DOMAIN in hass.data and config_entry.entry_id in hass.data[DOMAIN]
-    assert (
-        type(hass.data[DOMAIN][config_entry.entry_id]) == IdiamantDataUpdateCoordinator
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="test"
     )
+    auth = mock_auth()
 
-    # Reload the entry and assert that the data from above is still there
-    assert await async_reload_entry(hass, config_entry) is None
-    assert DOMAIN in hass.data and config_entry.entry_id in hass.data[DOMAIN]
-    assert (
-        type(hass.data[DOMAIN][config_entry.entry_id]) == IdiamantDataUpdateCoordinator
+    assert await setup_integration(hass, config_entry, auth)
+    assert config_entry.state is ConfigEntryState.LOADED
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    assert config_entry.state is ConfigEntryState.NOT_LOADED
+    assert config_entry.entry_id not in hass.data[DOMAIN]
+    auth.async_close.assert_awaited_once()
+
+
+async def test_setup_entry_not_ready(hass):
+    """Test the entry is set up again later when the topology cannot be fetched."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="test"
     )
+    auth = mock_auth()
+
+    with patch(
+        "custom_components.idiamant.IDiamantDataHandler.async_setup",
+        AsyncMock(side_effect=ApiError),
+    ):
+        assert await setup_integration(hass, config_entry, auth) is None
 
-    # Unload the entry and verify that the data has been removed
-    assert await async_unload_entry(hass, config_entry)
+    assert config_entry.state is ConfigEntryState.SETUP_RETRY
     assert config_entry.entry_id not in hass.data[DOMAIN]
+    auth.async_close.assert_awaited_once()
 
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
 
-async def test_setup_entry_exception(hass, error_on_get_data):
-    """Test ConfigEntryNotReady when API raises an exception during entry setup."""
-    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
 
-    # In this case we are testing the condition where async_setup_entry raises
-    # ConfigEntryNotReady using the `error_on_get_data` fixture which simulates
-    # an error.
-    with pytest.raises(ConfigEntryNotReady):
-        assert await async_setup_entry(hass, config_entry)
+async def test_setup_migrates_unique_id(hass):
+    """Test entries created before being bound to an account get its id on setup."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="test", unique_id=DOMAIN
+    )
+    auth = mock_auth()
+    auth.async_request.return_value = {"body": {"homes": [], "user": {"id": "user"}}}
+
+    assert await setup_integration(hass, config_entry, auth)
+    assert config_entry.unique_id == "user"
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_migrate_unique_id(hass):
+    """Test the unique id is only migrated to the id of an account fetched and not taken."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="test", unique_id=DOMAIN
+    )
+    config_entry.add_to_hass(hass)
+    auth = mock_auth()
+
+    # The account cannot be fetched: left for the next setup
+    for homes_data in (None, {"status": "ok"}, {"body": {"homes": []}}):
+        auth.async_request.return_value = homes_data
+        await async_migrate_unique_id(hass, config_entry, auth)
+        assert config_entry.unique_id == DOMAIN
+
+    auth.async_request.return_value = {"body": {"homes": [], "user": {"id": "user"}}}
+    await async_migrate_unique_id(hass, config_entry, auth)
+    assert config_entry.unique_id == "user"
+
+    # The account is already bound to another entry
+    duplicate_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="duplicate", unique_id=DOMAIN
+    )
+    duplicate_entry.add_to_hass(hass)
+    await async_migrate_unique_id(hass, duplicate_entry, auth)
+    assert duplicate_entry.unique_id == DOMAIN
@@ -0,0 +1,54 @@
+"""Test iDiamant request history."""
+from time import time
+from unittest.mock import MagicMock
+
+from custom_components.idiamant.api import (
+    AsyncConfigEntryNetatmoAuth,
+)
+from custom_components.idiamant.api import (
+    RequestLimiter,
+)
+from custom_components.idiamant.api import (
+    get_request_history,
+)
+from custom_components.idiamant.const import (
+    DOMAIN,
+)
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .const import MOCK_CONFIG
+
+
+def test_limiter_next_available():
+    """Test the next request waits for the oldest one to leave the rolling hour."""
+    now = int(time())
+    limiter = RequestLimiter(hourly_budget=2)
+    limiter.restore([now - 4000, now - 3000, now - 600])
+
+    # The request older than an hour is forgotten
+    assert limiter.export() == [now - 3000, now - 600]
+    assert limiter.remaining == 0
+    assert limiter.next_available == now - 3000 + 3600
+
+    limiter.configure(max_concurrent=2, hourly_budget=3)
+    assert limiter.next_available <= time()
+
+
+async def test_request_history_survives_restart(hass, hass_storage):
+    """Test the requests made before a restart still count in the hourly budget."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+    now = int(time())
+    hass_storage[f"{DOMAIN}.test.requests"] = {
+        "version": 1,
+        "key": f"{DOMAIN}.test.requests",
+        "data": [now - 60, now - 30],
+    }
+
+    auth = AsyncConfigEntryNetatmoAuth(MagicMock(), MagicMock())
+    await auth.async_load_request_history(get_request_history(hass, config_entry))
+    assert auth.limiter.used == 2
+
+    auth.limiter.record()
+    await auth.async_close()
+
+    assert len(hass_storage[f"{DOMAIN}.test.requests"]["data"]) == 3
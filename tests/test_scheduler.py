@@ -0,0 +1,53 @@
+"""Test iDiamant shared scheduler."""
+from datetime import timedelta
+from time import time
+from unittest.mock import MagicMock
+
+from custom_components.idiamant.scheduler import (
+    IDiamantScheduler,
+)
+from custom_components.idiamant.scheduler import (
+    STAGGER_DELAY,
+)
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+
+def mock_data_handler(next_due):
+    """Build a data handler due at given time."""
+    data_handler = MagicMock()
+    data_handler.next_due = next_due
+
+    def async_dispatch_update():
+        data_handler.next_due = time() + 60
+
+    data_handler.async_dispatch_update = MagicMock(side_effect=async_dispatch_update)
+
+    return data_handler
+
+
+async def test_accounts_are_staggered(hass):
+    """Test data handlers due at the same time are not polled on the same tick."""
+    scheduler = IDiamantScheduler(hass)
+    first = mock_data_handler(time())
+    second = mock_data_handler(time())
+
+    scheduler.async_register(first)
+    scheduler.async_register(second)
+
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await hass.async_block_till_done()
+
+    assert first.async_dispatch_update.call_count == 1
+    assert second.async_dispatch_update.call_count == 0
+
+    async_fire_time_changed(
+        hass, dt_util.utcnow() + timedelta(seconds=STAGGER_DELAY + 1)
+    )
+    await hass.async_block_till_done()
+
+    assert first.async_dispatch_update.call_count == 1
+    assert second.async_dispatch_update.call_count == 1
+
+    scheduler.async_unregister(first)
+    scheduler.async_unregister(second)
@@ -0,0 +1,73 @@
+"""Test iDiamant sensors."""
+from unittest.mock import patch
+
+from custom_components.idiamant.const import (
+    DOMAIN,
+)
+from custom_components.idiamant.data_handler import (
+    get_shutter_data_class_entry,
+)
+from custom_components.idiamant.sensor import (
+    IdiamantSensor,
+)
+from homeassistant.components.binary_sensor import DOMAIN as BINARY_SENSOR
+from homeassistant.components.sensor import DOMAIN as SENSOR
+from homeassistant.const import STATE_OFF
+from homeassistant.const import STATE_UNKNOWN
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .common import setup_integration
+from .const import MOCK_OAUTH_CONFIG
+
+
+async def test_health_sensors(hass):
+    """Test the health sensors follow the status, and are only written on change."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="test"
+    )
+    data_handler = await setup_integration(hass, config_entry)
+
+    entity_registry = er.async_get(hass)
+    rf_strength = entity_registry.async_get_entity_id(
+        SENSOR, DOMAIN, "shutter-1-1-rf_strength"
+    )
+    wifi_strength = entity_registry.async_get_entity_id(
+        SENSOR, DOMAIN, "gateway-1-wifi_strength"
+    )
+    reachable = entity_registry.async_get_entity_id(
+        BINARY_SENSOR, DOMAIN, "shutter-1-1-reachable"
+    )
+    assert rf_strength
+    assert wifi_strength
+    assert reachable
+    assert hass.states.get(rf_strength).state == STATE_UNKNOWN
+
+    data_class_entry = get_shutter_data_class_entry("home-1")
+    data_class = data_handler.data[data_class_entry]
+    modules = []
+
+    async def async_update():
+        data_class.changed_ids = data_handler.store.update_status(
+            {"id": "home-1", "modules": modules}
+        )
+
+    data_class.async_update.side_effect = async_update
+
+    modules[:] = [
+        {"id": "gateway-1", "wifi_strength": 55},
+        {"id": "shutter-1-1", "rf_strength": 70, "reachable": False},
+    ]
+    await data_handler.async_fetch_data(data_class_entry)
+    assert hass.states.get(wifi_strength).state == "55"
+    assert hass.states.get(rf_strength).state == "70"
+    assert hass.states.get(reachable).state == STATE_OFF
+
+    # A change of position does not touch the health sensors of the module
+    modules[:] = [{"id": "shutter-1-1", "current_position": 50}]
+    with patch.object(IdiamantSensor, "async_write_ha_state") as write_ha_state:
+        await data_handler.async_fetch_data(data_class_entry)
+
+    write_ha_state.assert_not_called()
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
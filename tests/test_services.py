@@ -0,0 +1,85 @@
+"""Test iDiamant services."""
+import asyncio
+
+from custom_components.idiamant.const import (
+    DOMAIN,
+)
+from custom_components.idiamant.const import (
+    EVENT_POSITIONS_SET,
+)
+from custom_components.idiamant.const import (
+    SERVICE_SET_POSITIONS,
+)
+from custom_components.idiamant.const import (
+    SETSTATE_PATH,
+)
+from custom_components.idiamant.data_handler import (
+    get_shutter_data_class_entry,
+)
+from homeassistant.components.cover import DOMAIN as COVER
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.common import async_capture_events
+
+from .common import setup_integration
+from .const import MOCK_OAUTH_CONFIG
+
+
+async def test_set_positions(hass):
+    """Test many covers are moved with a command per home, until confirmed."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_OAUTH_CONFIG, entry_id="test"
+    )
+    data_handler = await setup_integration(hass, config_entry)
+
+    entity_registry = er.async_get(hass)
+    window = entity_registry.async_get_entity_id(COVER, DOMAIN, "shutter-1-1")
+    living_room = entity_registry.async_get_entity_id(COVER, DOMAIN, "home-2-room-2-1")
+    events = async_capture_events(hass, EVENT_POSITIONS_SET)
+
+    auth = data_handler._auth
+    auth.async_request.reset_mock()
+
+    service_call = hass.async_create_task(
+        hass.services.async_call(
+            DOMAIN,
+            SERVICE_SET_POSITIONS,
+            {"positions": {window: 100, living_room: 0}, "timeout": 30},
+            blocking=True,
+        )
+    )
+    await asyncio.sleep(0.1)
+
+    # A single command per home
+    assert [call.args for call in auth.async_request.call_args_list] == [
+        ("POST", SETSTATE_PATH),
+        ("POST", SETSTATE_PATH),
+    ]
+    assert not service_call.done()
+
+    # The service returns once every module reached its target
+    for home_id, modules in (
+        ("home-1", [{"id": "shutter-1-1", "current_position": 100}]),
+        (
+            "home-2",
+            [
+                {"id": "shutter-2-1", "current_position": 0},
+                {"id": "shutter-2-2", "current_position": 0},
+            ],
+        ),
+    ):
+        data_handler.store.update_status({"id": home_id, "modules": modules})
+        await data_handler.async_fetch_data(get_shutter_data_class_entry(home_id))
+
+    await asyncio.wait_for(service_call, 1)
+
+    results = events[0].data["results"]
+    assert set(results) == {"shutter-1-1", "shutter-2-1", "shutter-2-2"}
+    assert results["shutter-2-1"] == {
+        "entity_id": living_room,
+        "target": 0,
+        "position": 0,
+        "status": "confirmed",
+    }
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
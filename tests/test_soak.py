@@ -0,0 +1,347 @@
+"""Soak test of iDiamant, against a fake Netatmo Connect API and a simulated clock.
+
+The default scale keeps it in the regular suite, see CONTRIBUTING.md to scale it up.
+"""
+from collections import Counter
+import gc
+import os
+import random
+import resource
+import tracemalloc
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from custom_components.idiamant.api import (
+    RequestLimiter,
+)
+from custom_components.idiamant.const import (
+    CONF_HOURLY_REQUEST_BUDGET,
+)
+from custom_components.idiamant.const import (
+    DATA_HANDLER,
+)
+from custom_components.idiamant.const import (
+    DOMAIN,
+)
+from custom_components.idiamant.const import (
+    HOMESDATA_PATH,
+)
+from custom_components.idiamant.const import (
+    HOMESTATUS_PATH,
+)
+from custom_components.idiamant.const import (
+    SETSTATE_PATH,
+)
+from custom_components.idiamant.scheduler import (
+    STAGGER_DELAY,
+)
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import callback
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .const import MOCK_OAUTH_CONFIG
+
+SOAK_HOMES = int(os.environ.get("IDIAMANT_SOAK_HOMES", 5))
+SOAK_MODULES = int(os.environ.get("IDIAMANT_SOAK_MODULES", 10))
+SOAK_HOURS = int(os.environ.get("IDIAMANT_SOAK_HOURS", 2))
+
+# Shutters moved by the inhabitants, across every home, per simulated hour.
+MOVES_PER_HOUR = 12
+# Shutters per room.
+ROOM_SIZE = 5
+# Simulated time (in seconds) during which the caches fill before measuring.
+WARM_UP = 3600
+# Python memory allowed to be kept over the measured period.
+MAX_MEMORY_GROWTH = 1024 * 1024
+# Peak resident memory (in kilobytes) allowed to grow over the measured period, to catch the
+# native memory (aiohttp, SSL) the traced Python memory does not see.
+MAX_RSS_GROWTH = 32 * 1024
+# Subscriber callbacks per poll: one per platform, whatever the number of entities.
+CALLBACKS_PER_POLL = 3
+
+
+class SimulatedClock:
+    """A clock only moving forward when told so, and the timers waiting for it."""
+
+    def __init__(self):
+        """Start the clock at an arbitrary date."""
+        self.now = 1_700_000_000.0
+        self.timers = []
+
+    def time(self):
+        """Return the simulated time."""
+        return self.now
+
+    def call_later(self, hass, delay, action):
+        """Schedule an action at a simulated time, like `async_call_later`."""
+        timer = [self.now + delay, action]
+        self.timers.append(timer)
+
+        def cancel():
+            if timer in self.timers:
+                self.timers.remove(timer)
+
+        return cancel
+
+    def pop_next_timer(self):
+        """Move to the next timer, and return its action."""
+        timer = min(self.timers, key=lambda timer: timer[0])
+        self.timers.remove(timer)
+        self.now = max(self.now, timer[0])
+
+        return timer[1]
+
+
+class FakeNetatmoApi:
+    """Serve many homes of shutters, standing for the authentication of the data classes."""
+
+    def __init__(self, homes, modules):
+        """Build the homes, each with a gateway and shutters spread over rooms."""
+        self.limiter = RequestLimiter()
+        self.requests = Counter()
+        self.position_changes = 0
+        self.homes = []
+        self.positions = {}
+        self._reported = {}
+
+        for home in range(homes):
+            home_id = f"home-{home}"
+            gateway_id = f"gateway-{home}"
+            shutters = [
+                {
+                    "id": f"shutter-{home}-{module}",
+                    "type": "NBR",
+                    "name": f"Shutter {module}",
+                    "room_id": f"room-{home}-{module // ROOM_SIZE}",
+                    "bridge": gateway_id,
+                }
+                for module in range(modules)
+            ]
+            self.homes.append(
+                {
+                    "id": home_id,
+                    "name": f"Home {home}",
+                    "rooms": [
+                        {"id": room_id, "name": room_id, "type": "livingroom"}
+                        for room_id in sorted(
+                            {shutter["room_id"] for shutter in shutters}
+                        )
+                    ],
+                    "modules": [
+                        {"id": gateway_id, "type": "NBG", "name": "Gateway"},
+                        *shutters,
+                    ],
+                }
+            )
+            self.positions.update({shutter["id"]: 0 for shutter in shutters})
+
+    def configure(self, max_concurrent, timeout, hourly_budget, hedge_requests):
+        """Apply the request limits of the options."""
+        self.limiter.configure(max_concurrent, hourly_budget)
+
+    async def async_get_access_token(self):
+        """Return a valid access token."""
+        return "access-token"
+
+    async def async_load_request_history(self, request_history):
+        """Start without any request made during the last hour."""
+
+    async def async_close(self):
+        """Close nothing, no connection being opened."""
+
+    async def async_request(self, method, path, params=None, body=None):
+        """Answer a request like Netatmo Connect API would."""
+        self.limiter.record()
+        self.requests[path] += 1
+
+        if path == HOMESDATA_PATH:
+            return {"body": {"homes": self.homes, "user": {"id": "user"}}}
+
+        if path == SETSTATE_PATH:
+            for module in body["home"]["modules"]:
+                self.positions[module["id"]] = module["target_position"]
+
+            return {"status": "ok"}
+
+        assert path == HOMESTATUS_PATH
+        home = self.homes[int(params["home_id"].split("-")[1])]
+        device_types = params["device_types"].split(",")
+        modules = []
+
+        for module in home["modules"]:
+            if module["type"] not in device_types:
+                continue
+
+            if module["type"] == "NBG":
+                modules.append({"id": module["id"], "type": "NBG", "wifi_strength": 60})
+
+                continue
+
+            position = self.positions[module["id"]]
+            if self._reported.get(module["id"], position) != position:
+                self.position_changes += 1
+
+            self._reported[module["id"]] = position
+            modules.append(
+                {
+                    "id": module["id"],
+                    "type": module["type"],
+                    "reachable": True,
+                    "rf_strength": 70,
+                    "current_position": position,
+                    "target_position": position,
+                }
+            )
+
+        return {"body": {"home": {"id": home["id"], "modules": modules}}}
+
+
+def get_rss():
+    """Return the peak resident memory of the process, in kilobytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def test_soak(hass):
+    """Test polling many homes for hours leaks no memory, and only writes the changes."""
+    clock = SimulatedClock()
+    api = FakeNetatmoApi(SOAK_HOMES, SOAK_MODULES)
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_OAUTH_CONFIG,
+        options={CONF_HOURLY_REQUEST_BUDGET: 1_000_000},
+        entry_id="test",
+    )
+    config_entry.add_to_hass(hass)
+
+    state_writes = Counter()
+    hass.bus.async_listen(
+        EVENT_STATE_CHANGED,
+        lambda event: state_writes.update([event.data["entity_id"].split(".")[0]]),
+    )
+    calls = Counter()
+
+    def count_calls(update_callback):
+        @callback
+        def async_counted_callback():
+            calls["callbacks"] += 1
+            update_callback()
+
+        return async_counted_callback
+
+    rng = random.Random(0)
+    module_ids = sorted(api.positions)
+    drift = 0.0
+
+    # Traced from the start, so that the memory of the traces taken during the warm-up does not
+    # count in the resident memory growth.
+    tracemalloc.start()
+
+    with patch("custom_components.idiamant.data_handler.time", clock.time), patch(
+        "custom_components.idiamant.scheduler.time", clock.time
+    ), patch("custom_components.idiamant.api.time", clock.time), patch(
+        "custom_components.idiamant.scheduler.async_call_later", clock.call_later
+    ), patch(
+        "custom_components.idiamant.config_entry_oauth2_flow."
+        "async_get_config_entry_implementation",
+        AsyncMock(return_value=MagicMock()),
+    ), patch(
+        "custom_components.idiamant.api.AsyncConfigEntryNetatmoAuth", return_value=api
+    ):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+
+        data_handler = hass.data[DOMAIN][config_entry.entry_id][DATA_HANDLER]
+        assert len(data_handler.store.modules) == SOAK_HOMES * SOAK_MODULES
+
+        fetch_data = data_handler.async_fetch_data
+
+        async def async_counted_fetch_data(data_class_entry):
+            calls["polls"] += 1
+            await fetch_data(data_class_entry)
+
+        data_handler.async_fetch_data = async_counted_fetch_data
+        for data_class in data_handler.data_classes.values():
+            data_class.subscriptions[:] = [
+                count_calls(update_callback) if update_callback else None
+                for update_callback in data_class.subscriptions
+            ]
+
+        start = clock.now
+        next_move = start
+        measuring = False
+
+        while clock.now < start + WARM_UP + SOAK_HOURS * 3600:
+            if not measuring and clock.now >= start + WARM_UP:
+                measuring = True
+                gc.collect()
+                memory, _ = tracemalloc.get_traced_memory()
+                rss = get_rss()
+                state_writes.clear()
+                api.requests.clear()
+                api.position_changes = 0
+                calls.clear()
+                drift = 0.0
+
+            # The inhabitants move a shutter from time to time.
+            if clock.now >= next_move:
+                module_id = rng.choice(module_ids)
+                home_id = data_handler.store.modules[module_id].home_id
+                await data_handler.async_set_state(
+                    home_id, {module_id: rng.choice((0, 50, 100))}
+                )
+                next_move += 3600 / MOVES_PER_HOUR
+
+            planned = {
+                name: data_class.next_scan
+                for name, data_class in data_handler.data_classes.items()
+            }
+
+            clock.pop_next_timer()()
+            await hass.async_block_till_done()
+
+            # How late the data classes scanned were, compared with when they were due.
+            drift = max(
+                [
+                    drift,
+                    *(
+                        clock.now - next_scan
+                        for name, next_scan in planned.items()
+                        if data_handler.data_classes[name].next_scan != next_scan
+                    ),
+                ]
+            )
+
+        gc.collect()
+        memory_growth = tracemalloc.get_traced_memory()[0] - memory
+        tracemalloc.stop()
+        rss_growth = get_rss() - rss
+
+        assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+    summary = (
+        f"{SOAK_HOMES * SOAK_MODULES} modules in {SOAK_HOMES} homes, "
+        f"{SOAK_HOURS} h: {sum(api.requests.values())} requests {dict(api.requests)}, "
+        f"{api.position_changes} position changes, state writes {dict(state_writes)}, "
+        f"{calls['callbacks']} callbacks for {calls['polls']} polls, "
+        f"scheduler drift {drift:.1f} s, memory growth {memory_growth} B, "
+        f"peak RSS growth {rss_growth} kB"
+    )
+
+    # Every shutters poll of every home was made
+    assert (
+        api.requests[HOMESTATUS_PATH] >= SOAK_HOMES * SOAK_HOURS * 3600 / 300
+    ), summary
+
+    # A moved shutter only writes its cover, its room and its home
+    assert sum(state_writes.values()) <= 3 * api.position_changes, summary
+
+    # A poll only calls one callback per platform
+    assert calls["callbacks"] <= CALLBACKS_PER_POLL * calls["polls"], summary
+
+    # The scheduler keeps up with the homes
+    assert drift <= 2 * STAGGER_DELAY, summary
+
+    assert memory_growth < MAX_MEMORY_GROWTH, summary
+    assert rss_growth < MAX_RSS_GROWTH, summary
+    assert not data_handler._tasks
@@ -0,0 +1,158 @@
+"""Test iDiamant state store."""
+from custom_components.idiamant.store import (
+    IDiamantStore,
+)
+
+HOME = {
+    "id": "home-1",
+    "name": "Home",
+    "rooms": [
+        {"id": "room-1", "name": "Living room", "type": "livingroom"},
+        {"id": "room-2", "name": "Bedroom", "type": "bedroom"},
+    ],
+    "modules": [
+        {"id": "gateway-1", "type": "NBG", "name": "Gateway"},
+        {
+            "id": "shutter-1",
+            "type": "NBR",
+            "name": "Window",
+            "room_id": "room-1",
+            "bridge": "gateway-1",
+        },
+        {
+            "id": "shutter-2",
+            "type": "NBO",
+            "name": "Door",
+            "room_id": "room-2",
+            "bridge": "gateway-1",
+        },
+    ],
+}
+
+
+def test_topology_indexes():
+    """Test the records and their indexes are built from the topology."""
+    store = IDiamantStore()
+    store.update_topology(HOME)
+
+    assert store.homes["home-1"].room_ids == ("room-1", "room-2")
+    assert store.get_bridge("shutter-1").id == "gateway-1"
+    assert store.home_bridges == {"home-1": {"gateway-1"}}
+    assert [module.id for module in store.get_room_modules("room-2")] == ["shutter-2"]
+    assert {module.id for module in store.get_home_modules("home-1")} == {
+        "shutter-1",
+        "shutter-2",
+    }
+
+    # Records do not keep the raw API data around
+    assert not hasattr(store.modules["shutter-1"], "__dict__")
+
+    # A module moved to another room and a module removed from the home
+    store.update_topology(
+        {
+            **HOME,
+            "modules": [
+                HOME["modules"][0],
+                {**HOME["modules"][1], "room_id": "room-2"},
+            ],
+        }
+    )
+
+    assert "shutter-2" not in store.modules
+    assert store.room_modules["room-1"] == set()
+    assert store.room_modules["room-2"] == {"shutter-1"}
+
+    store.remove_home("home-1")
+
+    assert not store.homes
+    assert not store.modules
+    assert not store.bridges
+    assert not store.home_bridges
+    assert not store.module_bridge
+
+
+def test_topology_hash():
+    """Test the hash of the topology only changes with the topology."""
+    store = IDiamantStore()
+    store.update_topology(HOME)
+    topology_hash = store.get_topology_hash()
+
+    store.update_topology(HOME)
+    store.update_status(
+        {"id": "home-1", "modules": [{"id": "shutter-1", "current_position": 50}]}
+    )
+    assert store.get_topology_hash() == topology_hash
+
+    store.update_topology({**HOME, "name": "House"})
+    assert store.get_topology_hash() != topology_hash
+
+
+def test_status_changes():
+    """Test only the modules whose status changed are reported."""
+    store = IDiamantStore()
+    store.update_topology(HOME)
+
+    status = {
+        "id": "home-1",
+        "modules": [
+            {"id": "gateway-1", "type": "NBG", "wifi_strength": 50},
+            {"id": "shutter-1", "type": "NBR", "current_position": 0},
+            {"id": "shutter-2", "type": "NBO", "current_position": 100},
+            {"id": "unknown", "type": "NBR", "current_position": 100},
+        ],
+    }
+
+    assert store.update_status(status) == {"gateway-1", "shutter-1", "shutter-2"}
+    assert store.update_status(status) == set()
+
+    status["modules"][1]["current_position"] = 50
+    assert store.update_status(status) == {"shutter-1"}
+    assert store.modules["shutter-1"].current_position == 50
+    assert store.modules["shutter-1"].version == 2
+
+
+def test_status_module_types():
+    """Test the modules of other types are skipped."""
+    store = IDiamantStore()
+    store.update_topology(HOME)
+
+    status = {
+        "id": "home-1",
+        "modules": [
+            {"id": "gateway-1", "type": "NBG", "wifi_strength": 50},
+            {"id": "shutter-1", "type": "NBR", "current_position": 0},
+        ],
+    }
+
+    assert store.update_status(status, ["NBR"]) == {"shutter-1"}
+    assert store.bridges["gateway-1"].wifi_strength is None
+
+
+def test_home_bridges():
+    """Test the bridges of each home are indexed, as they are replaced or moved."""
+    store = IDiamantStore()
+    store.update_topology(HOME)
+    store.update_topology(
+        {
+            "id": "home-2",
+            "modules": [{"id": "gateway-2", "type": "NBG", "name": "Gateway"}],
+        }
+    )
+
+    # A gateway replaced
+    store.update_topology(
+        {**HOME, "modules": [{"id": "gateway-3", "type": "NBG", "name": "Gateway"}]}
+    )
+
+    assert set(store.bridges) == {"gateway-2", "gateway-3"}
+    assert store.home_bridges == {"home-1": {"gateway-3"}, "home-2": {"gateway-2"}}
+
+    # A gateway moved to another home
+    store.update_topology(
+        {"id": "home-2", "modules": [{"id": "gateway-3", "type": "NBG"}]}
+    )
+    store.update_topology({**HOME, "modules": []})
+
+    assert set(store.bridges) == {"gateway-3"}
+    assert store.bridges["gateway-3"].home_id == "home-2"
+    assert store.home_bridges == {"home-1": set(), "home-2": {"gateway-3"}}